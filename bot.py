@@ -1,119 +1,237 @@
 import asyncio
+import concurrent.futures
 import functools
+import hashlib
 import os
 import logging
-import importlib.util
+import threading
 import time
-import glob
-from typing import Dict, Any, List, Set
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
 from datetime import datetime
 
-from helpers.google import create_google_maps_link, create_google_calendar_link, get_event_location
+from helpers.google import create_google_maps_link, create_google_calendar_link, current_year, get_event_location
 
-from telegram import Update, BotCommand
+import orjson
+from cachetools import LRUCache, TTLCache
+from telegram import Update, BotCommand, MessageEntity
 from telegram.ext import (
     CommandHandler, 
     MessageHandler, 
     filters, 
     ContextTypes, 
-    ApplicationBuilder
+    ApplicationBuilder,
+    AIORateLimiter
 )
-from tinydb import TinyDB
+from telegram.request import HTTPXRequest
+from tinydb import TinyDB, where
+from tinydb.middlewares import CachingMiddleware
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional and not available on Windows
+    uvloop = None
+
+from helpers import event_store, render_cache
+from helpers.event_store import EventRow
+from helpers.message import FormattedText
+from helpers.orjson_storage import ORJSONStorage
 
 # Constants
 ADMIN_ID = os.getenv("ADMIN_ID")
+ADMIN_USER_ID = int(ADMIN_ID) if ADMIN_ID else None  # Compared against Telegram user IDs without str()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
-DATABASE_PATH = 'data/events.json'  # Main event storage
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "32"))  # Threads for blocking database work
+DATABASE_PATH = event_store.EVENTS_DB_PATH  # Main event storage
 AUTHORIZED_USERS_DB = 'data/authorized_users.json'
+EVENTS_CACHE_DIR = Path('data/cache')  # Rendered event messages, persisted across restarts
+EVENTS_CACHE_TTL = 3600  # 1 hour in seconds
+MESSAGE_CHUNK_SIZE = 4000  # Telegram allows 4096 characters; formatting is sent as entities, so no escaping overhead
+MAX_CONCURRENT_SENDS = 5  # Messages to different chats that may be in flight at once
+CONNECTION_POOL_SIZE = 20  # Connections to the Bot API, enough for a burst of sends
+# Part of every rendered message key; bump it whenever format_event_message changes its output,
+# so messages rendered by the previous formatting are not served from the caches. The current
+# year is part of the keys too, since calendar links are dated with it.
+RENDER_FORMAT_VERSION = 1
+
+
+# Set of authorized user IDs, seeded from the environment (defaults to the admin)
+# Immutable, and replaced as a whole when users are added or removed, so readers in other
+# threads always see a consistent set
+AUTHORIZED_USERS: FrozenSet[int] = frozenset(int(uid) for uid in os.getenv("AUTHORIZED_USERS", ADMIN_ID or "").split(",") if uid.strip())
+
+@dataclass(slots=True)
+class UserData:
+    """Per-user conversation state kept by the application."""
+    echo_mode: bool = False
+
+CONTEXT_TYPES = ContextTypes(user_data=UserData)
+
+@dataclass(slots=True)
+class UserHistory:
+    """Open seen-events file of a user, with the fingerprints it holds."""
+    file: TextIO
+    seen: Set[int]
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # Key of the rendered events the user was last checked against
+    checked_key: Optional[str] = None
+
+# Plain text messages that are not commands
+TEXT_NON_COMMAND = filters.TEXT & ~filters.COMMAND
+
+# Static replies
+UNAUTHORIZED_TEXT = "Sorry, you are not authorized to use this bot."
+WELCOME_TEXT = "Welcome! I am Parent Planner, an assistant that can help you find family events for the weekend. Use /help to see available commands."
+FETCHING_EVENTS_TEXT = "Fetching events..."
+HELP_TEXT = (
+    "I can do the following:\n"
+    "/restart - Restart the bot\n"
+    "/help - Show this help text\n"
+    "/events - Get event information\n"
+    "/echo - Echo your next message"
+)
 
-
-# List of authorized user IDs
-AUTHORIZED_USERS = [ADMIN_ID]
+# Commands shown in Telegram's command menu
+BOT_COMMANDS = (
+    BotCommand("restart", "Restart the bot"),
+    BotCommand("events", "Get event information"),
+    BotCommand("echo", "Repeat the next message you send"),
+    BotCommand("help", "Show help information"),
+)
 
 # Set up logging
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Import main function from planner.py
-spec = importlib.util.spec_from_file_location("planner", "./planner.py")
-planner = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(planner)
+# Ensure the data directory exists, once, before anything stores files in it
+os.makedirs('data', exist_ok=True)
+
+# Shared connection to the main event storage. Its users run in executor threads, so each
+# read or write holds EVENTS_DB_LOCK to keep their statements from interleaving.
+events_db = event_store.connect(DATABASE_PATH)
+EVENTS_DB_LOCK = threading.Lock()
+
+# Authorized users, kept open with reads served from memory; writes are flushed right away
+authorized_users_db = TinyDB(AUTHORIZED_USERS_DB, storage=CachingMiddleware(ORJSONStorage))
+
+# Rendered event messages shared by all users, keyed on the ISO week and database mtime
+EVENTS_CACHE = TTLCache(maxsize=64, ttl=EVENTS_CACHE_TTL)
+EVENTS_CACHE_LOCK = threading.Lock()
+
+# Rendered messages of individual events, keyed on a hash of the event, so events that did not
+# change are not rendered again when the database is updated. Guarded by EVENTS_CACHE_LOCK.
+EVENT_MESSAGE_CACHE = LRUCache(maxsize=1024)
+# Backing store for EVENT_MESSAGE_CACHE that survives restarts. Also guarded by EVENTS_CACHE_LOCK.
+render_cache_db = render_cache.connect()
+
+# Seen-events databases of users who used /events, kept open between calls
+USER_HISTORIES: Dict[int, UserHistory] = {}
+USER_HISTORIES_LOCK = threading.Lock()
+
+# Worker process for the planner, created in main()
+PLANNER_POOL = None
+# Planner run in progress, shared by everyone who asks for a run while it is going
+PLANNER_RUN: Optional[asyncio.Future] = None
 
 # Global variable to track last update time
 last_update_time = 0
 UPDATE_INTERVAL = 60 * 60 * 24  # 24 hours in seconds
+UPDATE_RETRY_INTERVAL = 60  # Delay before retrying a failed update
+
+def _run_planner_entry() -> int:
+    """Entry point for the planner worker process."""
+    # Imported here so the scraping dependencies are only loaded by the worker, not the bot
+    from planner import main as planner_main
+    return planner_main(logger)
+
+async def _run_planner(app=None) -> int:
+    loop = asyncio.get_running_loop()
+    stored_count = await loop.run_in_executor(PLANNER_POOL, _run_planner_entry)
+    # Off the event loop, since the lock may be held by a render in progress
+    await asyncio.to_thread(clear_events_cache)
+    # Users are notified here, once per run, rather than by each caller sharing the run
+    if app is not None and stored_count > 0:
+        logger.info(f"Found {stored_count} new events, sending notifications to users")
+        await notify_users_of_new_events(app, stored_count)
+    return stored_count
+
+async def run_planner(app=None) -> int:
+    """Run the planner in its worker process and return the number of new events; a run started with `app` notifies users."""
+    global PLANNER_RUN
+    # Callers that arrive while a run is in progress wait for that run instead of starting another
+    if PLANNER_RUN is None or PLANNER_RUN.done():
+        PLANNER_RUN = asyncio.ensure_future(_run_planner(app))
+    # Shielded, so a cancelled caller does not cancel the run for the others
+    return await asyncio.shield(PLANNER_RUN)
+
+def clear_events_cache(include_messages: bool = False):
+    """Drop all rendered event messages so they are rebuilt from the database."""
+    with EVENTS_CACHE_LOCK:
+        EVENTS_CACHE.clear()
+        for cache_path in EVENTS_CACHE_DIR.glob('*.json'):
+            cache_path.unlink(missing_ok=True)
+        # Per-event messages only go stale when the formatting changes, which bumping
+        # RENDER_FORMAT_VERSION already handles; this is for clearing them by hand
+        if include_messages:
+            EVENT_MESSAGE_CACHE.clear()
+            render_cache.clear(render_cache_db)
+
+def clear_events():
+    """Remove all events from the main database."""
+    with EVENTS_DB_LOCK:
+        event_store.clear_events(events_db)
 
 def load_authorized_users():
-    """Load authorized users from the database and append to AUTHORIZED_USERS."""
-    os.makedirs('data', exist_ok=True)
-    db = TinyDB(AUTHORIZED_USERS_DB)
-    user_ids = [str(u['user_id']) for u in db.all() if 'user_id' in u]
-    # Avoid duplicates
-    for uid in user_ids:
-        if uid not in AUTHORIZED_USERS:
-            AUTHORIZED_USERS.append(uid)
-
-def add_authorized_user(user_id: str):
-    db = TinyDB(AUTHORIZED_USERS_DB)
-    if not db.contains({'user_id': user_id}):
-        db.insert({'user_id': user_id})
-
-def remove_authorized_user(user_id: str):
-    db = TinyDB(AUTHORIZED_USERS_DB)
-    db.remove(lambda u: u.get('user_id') == user_id)
+    """Load authorized users from the database and add them to AUTHORIZED_USERS."""
+    global AUTHORIZED_USERS
+    AUTHORIZED_USERS = AUTHORIZED_USERS.union(int(u['user_id']) for u in authorized_users_db.all() if 'user_id' in u)
+
+def authorized_user_query(user_id: int):
+    """Return a query matching a stored user ID, including IDs stored as strings by older versions."""
+    return where('user_id').one_of([user_id, str(user_id)])
+
+def is_stored_authorized_user(user_id: int) -> bool:
+    return authorized_users_db.contains(authorized_user_query(user_id))
+
+def add_authorized_user(user_id: int):
+    if not is_stored_authorized_user(user_id):
+        authorized_users_db.insert({'user_id': user_id})
+        authorized_users_db.storage.flush()
+
+def remove_authorized_user(user_id: int):
+    authorized_users_db.remove(authorized_user_query(user_id))
+    authorized_users_db.storage.flush()
 
 async def scheduled_update(app):
     """Background task that updates the event database every hour and notifies users of new events."""
     global last_update_time
     
     while True:
-        current_time = time.time()
-        
-        # Check if an hour has passed since the last update
-        if current_time - last_update_time >= UPDATE_INTERVAL:
-            logger.info(f"Running scheduled update at {datetime.now()}")
-            try:
-                # Get count of events before update
-                event_count_before = 0
-                try:
-                    if os.path.exists(DATABASE_PATH):
-                        main_db = TinyDB(DATABASE_PATH)
-                        event_count_before = len(main_db.all())
-                except Exception as e:
-                    logger.error(f"Error counting events before update: {str(e)}")
-                
-                # Run planner in a thread pool to avoid blocking
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(None, lambda: planner.main(logger))
-                
-                # Update the last update time
-                last_update_time = current_time
-                logger.info(f"Scheduled update completed at {datetime.now()}")
-                
-                # Get count of events after update
-                event_count_after = 0
-                try:
-                    if os.path.exists(DATABASE_PATH):
-                        main_db = TinyDB(DATABASE_PATH)
-                        event_count_after = len(main_db.all())
-                except Exception as e:
-                    logger.error(f"Error counting events after update: {str(e)}")
-                
-                # If new events were added, notify users
-                new_event_count = event_count_after - event_count_before
-                if new_event_count > 0:
-                    logger.info(f"Found {new_event_count} new events, sending notifications to users")
-                    await notify_users_of_new_events(app, new_event_count)
-                
-            except Exception as e:
-                logger.error(f"Error in scheduled update: {str(e)}")
+        # Sleep until the next update is due instead of polling for it
+        time_until_update = last_update_time + UPDATE_INTERVAL - time.time()
+        if time_until_update > 0:
+            await asyncio.sleep(time_until_update)
         
-        # Sleep for a minute before checking again
-        await asyncio.sleep(60)
+        current_time = time.time()
+        logger.info(f"Running scheduled update at {datetime.now()}")
+        try:
+            # Run planner in its worker process to avoid blocking; the run notifies users of new events
+            await run_planner(app)
+            
+            # Update the last update time
+            last_update_time = current_time
+            logger.info(f"Scheduled update completed at {datetime.now()}")
+            
+        except Exception as e:
+            logger.error(f"Error in scheduled update: {str(e)}")
+            # Try again shortly rather than waiting for the next interval
+            await asyncio.sleep(UPDATE_RETRY_INTERVAL)
 
 async def notify_users_of_new_events(app, new_event_count: int):
     """Send notification to all users that new events are available."""
-    user_ids = get_all_user_ids()
+    # Authorized users are kept in memory, so fan-out needs no scan of the data directory
+    user_ids = AUTHORIZED_USERS
     logger.info(f"Sending notifications to {len(user_ids)} users")
     
     # Prepare notification message
@@ -122,106 +240,275 @@ async def notify_users_of_new_events(app, new_event_count: int):
     else:
         message = f"🔔 There are {new_event_count} new events available! Use /events to check them out."
     
-    # Send notification to each user
-    for user_id in user_ids:
+    # Send notifications concurrently, with a bounded number of requests in flight
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SENDS)
+
+    async def send(user_id: int):
         try:
-            # Convert string user ID to integer for Telegram API
-            int_user_id = int(user_id)
-            if str(int_user_id) in AUTHORIZED_USERS:
-                await app.bot.send_message(chat_id=int_user_id, text=message)
-                logger.info(f"Sent notification to user {user_id}")
-                # Add small delay to avoid hitting rate limits
-                await asyncio.sleep(0.1)
+            async with semaphore:
+                await app.bot.send_message(chat_id=user_id, text=message)
+            logger.info(f"Sent notification to user {user_id}")
         except Exception as e:
             logger.error(f"Failed to send notification to user {user_id}: {str(e)}")
 
+    await asyncio.gather(*(send(user_id) for user_id in user_ids))
+
 # Function to get list of all user IDs from data directory
-def get_all_user_ids() -> List[str]:
-    """Get all user IDs by listing the JSON files in the data directory except events.json."""
+def get_all_user_ids() -> List[int]:
+    """Get all user IDs by listing the seen-events files in the data directory."""
     user_ids = []
-    os.makedirs('data', exist_ok=True)  # Ensure directory exists
-    
-    # List all .json files in the data directory
-    json_files = glob.glob('data/*.json')
     
-    for file_path in json_files:
-        # Extract just the filename without path or extension
-        filename = os.path.basename(file_path)
-        name_without_ext = os.path.splitext(filename)[0]
-        
-        # Skip the main events database
-        if name_without_ext != 'events':
+    # A single directory scan; names are checked without building paths
+    with os.scandir('data') as entries:
+        for entry in entries:
+            name_without_ext, ext = os.path.splitext(entry.name)
+            
             # Only add IDs that are numeric (valid user IDs)
-            if name_without_ext.isdigit():
-                user_ids.append(name_without_ext)
+            if ext == '.fps' and name_without_ext.isdigit():
+                user_ids.append(int(name_without_ext))
     
     return user_ids
 
+def migrate_user_databases():
+    """Convert seen-events TinyDB files (data/<user_id>.json) to fingerprint files."""
+    with os.scandir('data') as entries:
+        legacy_files = [
+            (entry.path, entry.name[:-5])
+            for entry in entries
+            if entry.name.endswith('.json') and entry.name[:-5].isdigit()
+        ]
+    for file_path, name_without_ext in legacy_files:
+        try:
+            with open(file_path, 'rb') as f:
+                data = orjson.loads(f.read() or b'{}')
+            fingerprints = [
+                record['fingerprint']
+                for table in data.values()
+                for record in table.values()
+                if 'fingerprint' in record
+            ]
+            with open(get_user_db_path(int(name_without_ext)), 'a', encoding='utf-8') as f:
+                f.writelines(f"{event_store.fingerprint_key(fingerprint)}\n" for fingerprint in fingerprints)
+            os.remove(file_path)
+            logger.info(f"Migrated {len(fingerprints)} seen events for user {name_without_ext}.")
+        except Exception as e:
+            logger.error(f"Error migrating user database {file_path}: {str(e)}")
+
 # Helper functions for event processing
-def format_event_message(event: Dict[str, Any]) -> str:
-    """Format event data into a formatted message string."""
-    event_text = ""
+def format_event_message(event: EventRow) -> FormattedText:
+    """Format event data into message text with Telegram formatting entities."""
+    message = FormattedText()
     
     # Title as clickable link
-    title_text = f"{event['title']}"
-    if 'link' in event and event['link']:
-        title_text = f"[{title_text}]({event['link']})"
-    event_text += f"📌 {title_text}\n\n"
+    message.add("📌 ")
+    if event.link:
+        message.add(event.title, MessageEntity.TEXT_LINK, url=event.link)
+    else:
+        message.add(event.title)
+    message.add("\n\n")
     
     # Date and time
-    if 'date' in event:
-        event_text += f"📅 *Date:* {event['date']}\n"
-    if 'time' in event and event['time']:
-        event_text += f"🕒 *Time:* {event['time']}\n"
+    if event.date:
+        message.add("📅 ").add("Date:", MessageEntity.BOLD).add(f" {event.date}\n")
+    if event.time:
+        message.add("🕒 ").add("Time:", MessageEntity.BOLD).add(f" {event.time}\n")
     
     # Status
-    if 'status' in event and event['status'] and event['status'] != "Confirmed":
-        event_text += f"📊 *Status:* {event['status']}\n"
+    if event.status and event.status != "Confirmed":
+        message.add("📊 ").add("Status:", MessageEntity.BOLD).add(f" {event.status}\n")
     
     # Cost
-    if 'cost' in event and event['cost']:
-        event_text += f"💰 *Cost:* {event['cost']}\n"
+    if event.cost:
+        message.add("💰 ").add("Cost:", MessageEntity.BOLD).add(f" {event.cost}\n")
     
     # Location with Google Maps link
     location = get_event_location(event)
     maps_url = create_google_maps_link(location)
-    event_text += f"📍 *Location:* [{location}]({maps_url})\n"
+    message.add("📍 ").add("Location:", MessageEntity.BOLD).add(" ")
+    message.add(location, MessageEntity.TEXT_LINK, url=maps_url).add("\n")
     
     # Weather
-    if 'weather' in event and event['weather']:
-        weather = event['weather']
-        event_text += (f"🌤️ *Weather:* {weather['summary']}, with a max temperature of {weather['temp_max']}°C, "
-                       f"winds of up to {weather['max_wind_speed']} km/h, and {weather['precipitation_probability_text']}\n")
+    if event.weather:
+        weather = event.weather
+        message.add("🌤️ ").add("Weather:", MessageEntity.BOLD)
+        message.add(f" {weather['summary']}, with a max temperature of {weather['temp_max']}°C, "
+                    f"winds of up to {weather['max_wind_speed']} km/h, and {weather['precipitation_probability_text']}\n")
     
     # Add Google Calendar link
-    if 'date' in event:
+    if event.date:
         calendar_url = create_google_calendar_link(event)
         if calendar_url:
-            event_text += f"\n📆 [Add to Google Calendar]({calendar_url})\n"
+            message.add("\n📆 ").add("Add to Google Calendar", MessageEntity.TEXT_LINK, url=calendar_url).add("\n")
     
     # Description with italic formatting
-    if 'description' in event and event['description']:
-        desc = event['description']
+    if event.description:
+        desc = event.description
         if len(desc) > 200:
             desc = desc[:197] + "..."
-        event_text += f"\n_{desc}_"
+        message.add("\n").add(desc, MessageEntity.ITALIC)
     
-    return event_text
+    return message
+
+def batch_messages(messages: Iterable[FormattedText], limit: int = MESSAGE_CHUNK_SIZE) -> Iterator[FormattedText]:
+    """Join messages into as few chunks as possible, each at most `limit` characters long."""
+    # Chunks are yielded as soon as they are full, so the first one can be sent right away
+    buf = FormattedText()
+    for message in messages:
+        if len(buf) and len(buf) + len(message) + 2 > limit:
+            yield buf
+            buf = FormattedText()
+        if len(buf):
+            buf.add("\n\n")
+        buf.extend(message)
+    if len(buf):
+        yield buf
+
+def parse_fingerprint(line: str) -> int:
+    """Parse a line of a seen-events file into a fingerprint."""
+    if len(line) == 16:
+        try:
+            return int(line, 16)
+        except ValueError:
+            pass
+    # Older files hold the raw "title-date" key instead of its hash
+    return int(event_store.fingerprint_key(line), 16)
+
+def rendered_events_key() -> str:
+    """Return the key identifying the current set of rendered events."""
+    # The database mtime is part of the key, so writes made outside this process (e.g. running
+    # planner.py by hand) also invalidate the rendered events
+    return f"v{RENDER_FORMAT_VERSION}-{current_year()}-{datetime.utcnow().strftime('%G-%V')}-{os.stat(DATABASE_PATH).st_mtime_ns}"
+
+def get_rendered_events() -> List[Tuple[int, FormattedText]]:
+    """Return (fingerprint, message) pairs for all stored events, rendering them once per cache period."""
+    key = rendered_events_key()
+    with EVENTS_CACHE_LOCK:
+        # Read once: a TTLCache entry can expire between a membership test and a lookup
+        rendered = EVENTS_CACHE.get(key)
+        if rendered is None:
+            rendered = load_cached_events(key)
+            if rendered is None:
+                # Rows are rendered as they are read, without materializing the raw events first.
+                # Newly rendered messages are committed to the render cache in one transaction.
+                with render_cache_db, EVENTS_DB_LOCK:
+                    rendered = [
+                        (int(event.fingerprint, 16), render_event(event))
+                        for event in event_store.iter_events(events_db)
+                    ]
+                logger.info(f"Fetched {len(rendered)} events from the main database.")
+                save_cached_events(key, rendered)
+            EVENTS_CACHE[key] = rendered
+        return rendered
+
+def render_event(event: EventRow) -> FormattedText:
+    """Return the formatted message for an event, reusing the one rendered for identical event data and formatting."""
+    key = hashlib.blake2b(orjson.dumps([RENDER_FORMAT_VERSION, current_year(), event]), digest_size=16).digest()
+    message = EVENT_MESSAGE_CACHE.get(key)
+    if message is None:
+        message = render_cache.get_message(render_cache_db, key)
+        if message is None:
+            message = format_event_message(event)
+            render_cache.put_message(render_cache_db, key, message)
+        EVENT_MESSAGE_CACHE[key] = message
+    return message
+
+def load_cached_events(key: str) -> Optional[List[Tuple[int, FormattedText]]]:
+    """Load rendered events persisted on disk under `key`, or None if missing or stale."""
+    cache_path = EVENTS_CACHE_DIR / f"rendered-{key}.json"
+    try:
+        if cache_path.stat().st_mtime < time.time() - EVENTS_CACHE_TTL:
+            return None
+        return [(fingerprint, FormattedText.from_dict(message)) for fingerprint, message in orjson.loads(cache_path.read_bytes())]
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.error(f"Error loading cached events from {cache_path}: {str(e)}")
+        return None
+
+def save_cached_events(key: str, rendered_events: List[Tuple[int, FormattedText]]):
+    """Persist rendered events on disk under `key`."""
+    try:
+        EVENTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Entries under other keys are outdated once a new one is rendered
+        for cache_path in EVENTS_CACHE_DIR.glob('*.json'):
+            cache_path.unlink(missing_ok=True)
+        data = [(fingerprint, message.to_dict()) for fingerprint, message in rendered_events]
+        (EVENTS_CACHE_DIR / f"rendered-{key}.json").write_bytes(orjson.dumps(data))
+    except Exception as e:
+        logger.error(f"Error saving cached events: {str(e)}")
 
 def get_user_db_path(user_id: int) -> str:
-    """Return the database path for a specific user's seen events."""
-    os.makedirs('data', exist_ok=True)  # Ensure directory exists
-    return f'data/{user_id}.json'
+    """Return the path of the file holding a specific user's seen events, one fingerprint per line."""
+    return f'data/{user_id}.fps'
+
+def get_user_history(user_id: int) -> UserHistory:
+    """Return the seen-events history of a user, loading it from disk on first use."""
+    with USER_HISTORIES_LOCK:
+        history = USER_HISTORIES.get(user_id)
+        if history is None:
+            # The file is only ever appended to, so it stays open for the next /events
+            user_file = open(get_user_db_path(user_id), 'a+', encoding='utf-8')
+            user_file.seek(0)
+            seen = {parse_fingerprint(line) for line in user_file.read().splitlines() if line}
+            history = USER_HISTORIES[user_id] = UserHistory(user_file, seen)
+        return history
+
+def close_user_history(user_id: int):
+    """Close a user's cached seen-events file so it can be removed or reopened."""
+    with USER_HISTORIES_LOCK:
+        history = USER_HISTORIES.pop(user_id, None)
+    if history is not None:
+        with history.lock:
+            history.file.close()
+
+def fetch_new_events(user_id: int) -> List[FormattedText]:
+    """Return the rendered events a user has not seen yet, and record them as seen."""
+    try:
+        # Taken before reading the events, so an update that lands meanwhile is picked up next time
+        events_key = rendered_events_key()
+
+        # Get user's seen events, cached since their first /events
+        history = get_user_history(user_id)
+        with history.lock:
+            # Nothing changed since the last check, so every event is already marked as seen
+            if history.checked_key == events_key:
+                logger.info(f"No new events for user {user_id} since their last check.")
+                return []
+
+            # Get all events, already rendered, from the shared cache
+            all_events = get_rendered_events()
+            logger.info(f"User {user_id} has seen a total of {len(history.seen)} events.")
+
+            # Filter out events the user has already seen
+            new_events = []
+            new_fingerprints = []
+            for fingerprint, message in all_events:
+                if fingerprint not in history.seen:
+                    new_events.append(message)
+                    history.seen.add(fingerprint)
+                    new_fingerprints.append(fingerprint)
+
+            # Record them with a single append to the user's file
+            if new_fingerprints:
+                history.file.write("".join(f"{fingerprint:016x}\n" for fingerprint in new_fingerprints))
+                history.file.flush()
+            history.checked_key = events_key
+
+        return new_events
+    except Exception as e:
+        logger.error(f"Error fetching events: {str(e)}")
+        return []
 
 # Decorator function to check authorization
 def restricted(func):
     @functools.wraps(func)
     async def wrapped(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
-        user_id = update.effective_user.id
-        if str(user_id) not in AUTHORIZED_USERS:
-            log_message = f"Unauthorized access attempt by user with ID: {user_id} and with username: {update.effective_user.username}"
-            logger.warning(log_message)
-            await update.message.reply_text("Sorry, you are not authorized to use this bot.")
+        user = update.effective_user
+        user_id = user.id
+        if user_id not in AUTHORIZED_USERS:
+            logger.warning(f"Unauthorized access attempt by user with ID: {user_id} and with username: {user.username}")
+            # Don't hold the handler on the reply; the application keeps track of the task
+            context.application.create_task(update.message.reply_text(UNAUTHORIZED_TEXT), update=update)
             return
         return await func(update, context, *args, **kwargs)
     return wrapped
@@ -229,35 +516,34 @@ def restricted(func):
 # Command handlers
 @restricted
 async def add_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    global AUTHORIZED_USERS
     user_id = update.effective_user.id
-    if str(user_id) != ADMIN_ID:
+    if user_id != ADMIN_USER_ID:
         await update.message.reply_text("Only the admin can add users.")
         return
     if not context.args or not context.args[0].isdigit():
         await update.message.reply_text("Usage: /add_user <user_id>")
         return
-    new_user_id = context.args[0]
+    new_user_id = int(context.args[0])
     add_authorized_user(new_user_id)
-    if new_user_id not in AUTHORIZED_USERS:
-        AUTHORIZED_USERS.append(new_user_id)
+    AUTHORIZED_USERS = AUTHORIZED_USERS | {new_user_id}
     await update.message.reply_text(f"User {new_user_id} added to authorized users.")
 
 @restricted
 async def remove_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    global AUTHORIZED_USERS
     user_id = update.effective_user.id
-    if str(user_id) != ADMIN_ID:
+    if user_id != ADMIN_USER_ID:
         await update.message.reply_text("Only the admin can remove users.")
         return
     if not context.args or not context.args[0].isdigit():
         await update.message.reply_text("Usage: /remove_user <user_id>")
         return
-    remove_id = context.args[0]
-    db = TinyDB(AUTHORIZED_USERS_DB)
-    user_exists = db.contains({'user_id': remove_id})
+    remove_id = int(context.args[0])
+    user_exists = is_stored_authorized_user(remove_id)
     if user_exists:
         remove_authorized_user(remove_id)
-        if remove_id in AUTHORIZED_USERS:
-            AUTHORIZED_USERS.remove(remove_id)
+        AUTHORIZED_USERS = AUTHORIZED_USERS - {remove_id}
         await update.message.reply_text(f"User {remove_id} removed from authorized users.")
     else:
         await update.message.reply_text(f"User {remove_id} was not an authorized user.")
@@ -265,11 +551,10 @@ async def remove_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 @restricted
 async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    if str(user_id) != ADMIN_ID:
+    if user_id != ADMIN_USER_ID:
         await update.message.reply_text("Only the admin can list authorized users.")
         return
-    db = TinyDB(AUTHORIZED_USERS_DB)
-    users = [str(u['user_id']) for u in db.all() if 'user_id' in u]
+    users = [str(u['user_id']) for u in authorized_users_db.all() if 'user_id' in u]
     if not users:
         await update.message.reply_text("No authorized users found.")
     else:
@@ -282,36 +567,12 @@ async def force_fetch(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
     user_id = update.effective_user.id
 
-    if str(user_id) == ADMIN_ID:
+    if user_id == ADMIN_USER_ID:
         try:
-            # Get count of events before update
-            event_count_before = 0
-            try:
-                if os.path.exists(DATABASE_PATH):
-                    main_db = TinyDB(DATABASE_PATH)
-                    event_count_before = len(main_db.all())
-            except Exception as e:
-                logger.error(f"Error counting events before update: {str(e)}")
+            # Run planner in its worker process to avoid blocking; the run notifies users of new events
+            new_event_count = await run_planner(context.application)
             
-            # Run planner in a thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, lambda: planner.main(logger))
-            
-            # Get count of events after update
-            event_count_after = 0
-            try:
-                if os.path.exists(DATABASE_PATH):
-                    main_db = TinyDB(DATABASE_PATH)
-                    event_count_after = len(main_db.all())
-            except Exception as e:
-                logger.error(f"Error counting events after update: {str(e)}")
-            
-            # If new events were added, notify users
-            new_event_count = event_count_after - event_count_before
             if new_event_count > 0:
-                logger.info(f"Found {new_event_count} new events, sending notifications to users")
-                # Use the application from context instead of app
-                await notify_users_of_new_events(context.application, new_event_count)
                 await update.message.reply_text(f"Force fetch completed. Found {new_event_count} new events.")
             else:
                 await update.message.reply_text("Force fetch completed. No new events found.")
@@ -320,24 +581,32 @@ async def force_fetch(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             logger.error(f"Error in force fetch: {str(e)}")
             await update.message.reply_text("An error occurred during force fetch.")
 
+@restricted
+async def refresh(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    user_id = update.effective_user.id
+    if user_id != ADMIN_USER_ID:
+        await update.message.reply_text("Only the admin can refresh the events cache.")
+        return
+    await asyncio.to_thread(clear_events_cache, include_messages=True)
+    logger.info(f"Events cache cleared by admin {user_id}.")
+    await update.message.reply_text("Events cache cleared.")
+
 @restricted
 async def main_db_reset(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.info("Main database reset command received.")
 
     user_id = update.effective_user.id
 
-    if str(user_id) == ADMIN_ID:
-        # Remove the main database file if it exists
-        if os.path.exists(DATABASE_PATH):
-            try:
-                os.remove(DATABASE_PATH)
-                await update.message.reply_text("Main database reset successfully.")
-                logger.info(f"Main database reset by admin {user_id}.")
-            except Exception as e:
-                await update.message.reply_text("Error resetting main database.")
-                logger.error(f"Error resetting main database: {str(e)}")
-        else:
-            await update.message.reply_text("Main database does not exist.")
+    if user_id == ADMIN_USER_ID:
+        # Remove all events from the main database
+        try:
+            await asyncio.to_thread(clear_events)
+            await asyncio.to_thread(clear_events_cache)
+            await update.message.reply_text("Main database reset successfully.")
+            logger.info(f"Main database reset by admin {user_id}.")
+        except Exception as e:
+            await update.message.reply_text("Error resetting main database.")
+            logger.error(f"Error resetting main database: {str(e)}")
 
 @restricted
 async def user_db_reset(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -345,28 +614,24 @@ async def user_db_reset(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     
     user_id = update.effective_user.id
 
-    if str(user_id) == ADMIN_ID:
+    if user_id == ADMIN_USER_ID:
         # Remove all user databases
-        user_files = glob.glob('data/*.json')
-        for file_path in user_files:
-            filename = os.path.basename(file_path)
-            name_without_ext = os.path.splitext(filename)[0]
-            
-            # Skip the main events database
-            if name_without_ext != 'events':
-                try:
-                    os.remove(file_path)
-                    await update.message.reply_text(f"Removed user database for user {name_without_ext}.")
-                    logger.info(f"Removed user database for user {name_without_ext}.")
-                except Exception as e:
-                    await update.message.reply_text(f"Error removing user database for {name_without_ext}.")
-                    logger.error(f"Error removing user database for {name_without_ext}: {str(e)}")
+        for stored_user_id in get_all_user_ids():
+            try:
+                await asyncio.to_thread(close_user_history, stored_user_id)
+                os.remove(get_user_db_path(stored_user_id))
+                await update.message.reply_text(f"Removed user database for user {stored_user_id}.")
+                logger.info(f"Removed user database for user {stored_user_id}.")
+            except Exception as e:
+                await update.message.reply_text(f"Error removing user database for {stored_user_id}.")
+                logger.error(f"Error removing user database for {stored_user_id}: {str(e)}")
         await update.message.reply_text("All user databases reset successfully.")
 
 @restricted
 async def restart(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
     user_db_path = get_user_db_path(user_id)
+    await asyncio.to_thread(close_user_history, user_id)
     
     # Remove user's database if it exists
     if os.path.exists(user_db_path):
@@ -376,83 +641,39 @@ async def restart(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         except Exception as e:
             logger.error(f"Error removing database for user {user_id}: {str(e)}")
     
-    await update.message.reply_text("Welcome! I am Parent Planner, an assistant that can help you find family events for the weekend. Use /help to see available commands.")
+    await update.message.reply_text(WELCOME_TEXT)
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    help_text = (
-        "I can do the following:\n"
-        "/restart - Restart the bot\n"
-        "/help - Show this help text\n"
-        "/events - Get event information\n"
-        "/echo - Echo your next message"
-    )
-    await update.message.reply_text(help_text)
+    await update.message.reply_text(HELP_TEXT)
 
 async def echo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    context.user_data['echo_mode'] = True
+    context.user_data.echo_mode = True
     await update.message.reply_text("I will now echo whatever you send.")
 
 async def handle_echo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if context.user_data.get('echo_mode', False):
+    if context.user_data.echo_mode:
         await update.message.reply_text(update.message.text)
-        context.user_data['echo_mode'] = False
+        context.user_data.echo_mode = False
 
 # Main events command handler
 @restricted
 async def events(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    await update.message.reply_text("Fetching events...")
+    await update.message.reply_text(FETCHING_EVENTS_TEXT)
     
     try:
-        # Define a synchronous function that we can run in the executor
-        def sync_fetch_events(user_id):
-            try:
-                # Get all events from main database
-                main_db = TinyDB(DATABASE_PATH)
-                all_events = main_db.all()
-                logger.info(f"Fetched {len(all_events)} events from the main database.")
-                
-                # Get user's seen events database
-                user_db_path = get_user_db_path(user_id)
-                user_db = TinyDB(user_db_path)
-                
-                # Get previously seen events
-                seen_event_fingerprints = set()
-                for record in user_db.all():
-                    if 'fingerprint' in record:
-                        seen_event_fingerprints.add(record['fingerprint'])
-                
-                logger.info(f"User {user_id} has seen a total of {len(seen_event_fingerprints)} events.")
-
-                # Filter out events the user has already seen
-                new_events = []
-                for event in all_events:
-                    fingerprint = f"{event.get('title', '')}-{event.get('date', '')}"
-                    
-                    if fingerprint not in seen_event_fingerprints:
-                        new_events.append(event)
-                        user_db.insert({'fingerprint': fingerprint})
-                
-                return new_events
-            except Exception as e:
-                logger.error(f"Error fetching events: {str(e)}")
-                return []
-        
-        # Run the synchronous function in a thread pool
-        loop = asyncio.get_event_loop()
-        new_events = await loop.run_in_executor(None, lambda: sync_fetch_events(user_id))
+        # Run the blocking fetch in the default (bot-io) thread pool
+        new_events = await asyncio.to_thread(fetch_new_events, user_id)
         
         if new_events:
             # Send a header message
             await update.message.reply_text(f"Found {len(new_events)} new events:")
             
-            # Send each event as a separate message
-            for event in new_events:
-                event_text = format_event_message(event)
-                await update.message.reply_text(event_text, parse_mode="Markdown", disable_web_page_preview=False)
-                
-                # Add a small delay between messages to avoid rate limiting
-                await asyncio.sleep(0.5)
+            # Send the events in as few messages as possible; the header already notified the user
+            for chunk in batch_messages(new_events):
+                await update.message.reply_text(
+                    chunk.text, entities=chunk.entities, disable_web_page_preview=True, disable_notification=True
+                )
         else:
             await update.message.reply_text("No new events found. Use /restart to reset your event history.")
     except Exception as e:
@@ -463,24 +684,39 @@ async def events(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 async def main():
     # Load authorized users from DB before starting the bot
     load_authorized_users()
+    migrate_user_databases()
 
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
-    
-    # Define commands for the command menu
-    commands = [
-        BotCommand("restart", "Restart the bot"),
-        BotCommand("events", "Get event information"),
-        BotCommand("echo", "Repeat the next message you send"),
-        BotCommand("help", "Show help information"),
-    ]
+    # A single worker, so that planner runs never write the events database concurrently
+    global PLANNER_POOL
+    PLANNER_POOL = concurrent.futures.ProcessPoolExecutor(max_workers=1)
+
+    # Size the default executor used for blocking TinyDB calls explicitly
+    asyncio.get_running_loop().set_default_executor(
+        concurrent.futures.ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE, thread_name_prefix="bot-io")
+    )
+
+    # Bot API requests get their own connection pool, separate from the long-polling getUpdates.
+    # They use HTTP/2, so a burst of sends is multiplexed over a few connections.
+    app = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .context_types(CONTEXT_TYPES)
+        .request(HTTPXRequest(connection_pool_size=CONNECTION_POOL_SIZE, pool_timeout=30, read_timeout=30, http_version="2"))
+        .get_updates_request(HTTPXRequest(read_timeout=30))
+        # Throttle sends to Telegram's flood limits (30 msg/s overall, 20 msg/min per group) and
+        # retry after a RetryAfter instead of sleeping a fixed time between messages
+        .rate_limiter(AIORateLimiter(max_retries=3))
+        .build()
+    )
     
     # Set the commands to show in the command menu
-    await app.bot.set_my_commands(commands)
+    await app.bot.set_my_commands(BOT_COMMANDS)
 
     # Admin commands
     app.add_handler(CommandHandler("main_db_reset", main_db_reset))
     app.add_handler(CommandHandler("user_db_reset", user_db_reset))
     app.add_handler(CommandHandler("force_fetch", force_fetch))
+    app.add_handler(CommandHandler("refresh", refresh))
     app.add_handler(CommandHandler("add_user", add_user))
     app.add_handler(CommandHandler("remove_user", remove_user))
     app.add_handler(CommandHandler("list_users", list_users))
@@ -491,7 +727,7 @@ async def main():
     app.add_handler(CommandHandler("events", events))
     app.add_handler(CommandHandler("echo", echo))
     app.add_handler(CommandHandler("help", help_command))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_echo))
+    app.add_handler(MessageHandler(TEXT_NON_COMMAND, handle_echo))
 
     # Start the bot
     await app.initialize()
@@ -502,9 +738,8 @@ async def main():
     global last_update_time
     # Force an immediate first update
     logger.info("Starting initial data fetch...")
-    loop = asyncio.get_event_loop()
     try:
-        await loop.run_in_executor(None, lambda: planner.main(logger))
+        await run_planner()
         last_update_time = time.time()
         logger.info("Initial data fetch completed")
     except Exception as e:
@@ -521,6 +756,11 @@ async def main():
         # Properly shut down
         await app.stop()
         await app.shutdown()
+        PLANNER_POOL.shutdown()
+        authorized_users_db.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -1,5 +1,36 @@
 import re
-import requests
+import threading
+import time
+import requests_cache
+from cachetools import TTLCache
+
+# Geocoding results rarely change, so responses are kept on disk for a month and the
+# connection to Nominatim is reused between requests
+GEOCODE_CACHE_PATH = 'data/geocode_cache'
+GEOCODE_CACHE_TTL = 30 * 24 * 60 * 60  # 30 days in seconds
+
+session = requests_cache.CachedSession(GEOCODE_CACHE_PATH, expire_after=GEOCODE_CACHE_TTL)
+session.headers['User-Agent'] = 'ParentingPlannerBot/1.0'
+
+# Nominatim's usage policy allows at most one request per second
+NOMINATIM_MIN_INTERVAL = 1.0
+nominatim_lock = threading.Lock()
+
+def nominatim_get(url, params):
+    """Send a request to Nominatim, waiting between requests that are not answered from the cache."""
+    with nominatim_lock:
+        response = session.get(url, params=params)
+        if not getattr(response, 'from_cache', False):
+            time.sleep(NOMINATIM_MIN_INTERVAL)
+    return response
+
+# Spelled-out ordinals and abbreviations with trailing dots, each replaced in a single pass
+ORDINALS = {
+    "First": "1st", "Second": "2nd", "Third": "3rd", "Fourth": "4th",
+    "Fifth": "5th", "Sixth": "6th", "Seventh": "7th", "Eighth": "8th", "Ninth": "9th", "Tenth": "10th"
+}
+ORDINAL_RE = re.compile(r"\b(" + "|".join(ORDINALS) + r")\b")
+ABBREVIATION_RE = re.compile(r"(Ave|St|Blvd)\.")
 
 def reverse_geocode(lat, lon):
     if lat is None or lon is None:
@@ -13,8 +44,7 @@ def reverse_geocode(lat, lon):
         'format': 'json',
         'addressdetails': 1
     }
-    headers = {'User-Agent': 'ParentingPlannerBot/1.0'}
-    response = requests.get(url, params=params, headers=headers)
+    response = nominatim_get(url, params)
     data = response.json()
     if data:
         address = data.get('address', {})
@@ -30,7 +60,25 @@ def is_valid_address(address):
         return False
     return True
 
+# Library branches and venues repeat across events, so results are also kept in memory. Only
+# addresses that were located are kept, so a failed lookup is tried again by the next event;
+# entries expire because the planner worker outlives a single run.
+GEOCODE_MEMORY_TTL = 24 * 60 * 60  # 1 day in seconds
+geocoded_addresses = TTLCache(maxsize=4096, ttl=GEOCODE_MEMORY_TTL)
+geocoded_addresses_lock = threading.Lock()
+
 def geocode_address(address):
+    with geocoded_addresses_lock:
+        result = geocoded_addresses.get(address)
+    if result is None:
+        result = lookup_address(address)
+        # A result without coordinates means the address was not found or is outside Washington
+        if result[1] is not None:
+            with geocoded_addresses_lock:
+                geocoded_addresses[address] = result
+    return result
+
+def lookup_address(address):
     if not is_valid_address(address):
         return address, None, None, False
 
@@ -43,9 +91,7 @@ def geocode_address(address):
         'format': 'json',
         'limit': 1
     }
-    headers = {'User-Agent': 'ParentingPlannerBot/1.0'}
-
-    response = requests.get(url, params=params, headers=headers)
+    response = nominatim_get(url, params)
 
     data = response.json()
     if data:
@@ -67,7 +113,7 @@ def geocode_address(address):
                 'format': 'json',
                 'limit': 1
             }
-            response = requests.get(url, params=params, headers=headers)
+            response = nominatim_get(url, params)
             data = response.json()
             if data:
                 complete_address = data[0].get('display_name', '')
@@ -83,12 +129,6 @@ def enrich_with_context(address):
     return address
 
 def normalize_address(address):
-    ordinals = {
-        "First": "1st", "Second": "2nd", "Third": "3rd", "Fourth": "4th",
-        "Fifth": "5th", "Sixth": "6th", "Seventh": "7th", "Eighth": "8th", "Ninth": "9th", "Tenth": "10th"
-    }
-    for word, number in ordinals.items():
-        address = re.sub(rf"\b{word}\b", number, address)
-
-    address = address.replace("Ave.", "Ave").replace("St.", "St").replace("Blvd.", "Blvd")
+    address = ORDINAL_RE.sub(lambda match: ORDINALS[match.group(1)], address)
+    address = ABBREVIATION_RE.sub(r"\1", address)
     return address.strip()
@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import os
+import sqlite3
+from dataclasses import dataclass, fields
+from typing import Dict, Any, Iterator, List, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+EVENTS_DB_PATH = 'data/events.db'
+
+# Columns of the events table, in the order used for inserts
+COLUMNS = (
+    'title', 'link', 'date', 'time', 'status', 'cost', 'location', 'full_address',
+    'lat', 'lon', 'is_estimated_address', 'description', 'format', 'provider',
+    'weather', 'suggestion', 'fingerprint'
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    link TEXT,
+    date TEXT,
+    time TEXT,
+    status TEXT,
+    cost TEXT,
+    location TEXT,
+    full_address TEXT,
+    lat REAL,
+    lon REAL,
+    is_estimated_address INTEGER,
+    description TEXT,
+    format TEXT,
+    provider TEXT,
+    weather TEXT,
+    suggestion TEXT,
+    fingerprint TEXT
+)
+"""
+
+# Lookups by fingerprint are used to deduplicate events
+INDEXES = "CREATE INDEX IF NOT EXISTS events_fingerprint ON events (fingerprint)"
+
+@dataclass(slots=True)
+class EventRow:
+    """Stored event fields needed to present an event to users."""
+    title: str = ""
+    link: str = ""
+    date: str = ""
+    time: str = ""
+    status: str = ""
+    cost: str = ""
+    location: str = ""
+    full_address: str = ""
+    is_estimated_address: bool = False
+    description: str = ""
+    weather: Optional[Dict[str, Any]] = None
+    fingerprint: str = ""
+
+# Columns read into EventRow objects
+ROW_FIELDS = tuple(field.name for field in fields(EventRow))
+
+def connect(path: str = EVENTS_DB_PATH) -> sqlite3.Connection:
+    """Open the events database, creating the events table if needed and importing older TinyDB events."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    with conn:
+        conn.execute(SCHEMA)
+        add_fingerprints(conn)
+        conn.execute(INDEXES)
+    # Events stored by older versions live in a TinyDB file next to the database, e.g. data/events.json
+    legacy_path = os.path.splitext(path)[0] + '.json'
+    if os.path.exists(legacy_path):
+        with conn:
+            imported = import_json_events(conn, legacy_path)
+        os.remove(legacy_path)
+        logger.info(f"Imported {imported} events from {legacy_path}.")
+    return conn
+
+def fingerprint_key(event_key: str) -> str:
+    """Return the fingerprint of an event key of the form "title-date", as 16 hex digits."""
+    return hashlib.blake2b(event_key.encode(), digest_size=8).hexdigest()
+
+def event_fingerprint(title: str, date: str) -> str:
+    """Return the fingerprint identifying an event by its title and date."""
+    return fingerprint_key(f"{title}-{date}")
+
+def add_fingerprints(conn: sqlite3.Connection):
+    """Add the fingerprint column to databases created without it, and fill it in."""
+    columns = {row['name'] for row in conn.execute("PRAGMA table_info(events)")}
+    if 'fingerprint' not in columns:
+        conn.execute("ALTER TABLE events ADD COLUMN fingerprint TEXT")
+    rows = conn.execute("SELECT id, title, date FROM events WHERE fingerprint IS NULL").fetchall()
+    conn.executemany(
+        "UPDATE events SET fingerprint = ? WHERE id = ?",
+        [(event_fingerprint(row['title'] or "", row['date'] or ""), row['id']) for row in rows]
+    )
+
+def import_json_events(conn: sqlite3.Connection, path: str) -> int:
+    """Insert the events of a TinyDB events file that are not stored yet, and return how many were added."""
+    with open(path, 'rb') as f:
+        data = orjson.loads(f.read() or b'{}')
+    imported = 0
+    for table in data.values():
+        # TinyDB document IDs follow insertion order, which is the order events are listed in
+        for _, event in sorted(table.items(), key=lambda item: int(item[0])):
+            if find_event(conn, event.get('title') or "", event.get('date') or "") is None:
+                insert_event(conn, event)
+                imported += 1
+    return imported
+
+def row_to_event(row: sqlite3.Row) -> EventRow:
+    """Convert a database row into an EventRow, replacing missing text with empty strings."""
+    return EventRow(
+        title=row['title'] or "",
+        link=row['link'] or "",
+        date=row['date'] or "",
+        time=row['time'] or "",
+        status=row['status'] or "",
+        cost=row['cost'] or "",
+        location=row['location'] or "",
+        full_address=row['full_address'] or "",
+        is_estimated_address=bool(row['is_estimated_address']),
+        description=row['description'] or "",
+        weather=orjson.loads(row['weather']) if row['weather'] else None,
+        fingerprint=row['fingerprint']
+    )
+
+def iter_events(conn: sqlite3.Connection, limit: Optional[int] = None) -> Iterator[EventRow]:
+    """Yield stored events oldest first, reading at most `limit` rows from the database."""
+    # A negative LIMIT means no limit in SQLite
+    query = f"SELECT {', '.join(ROW_FIELDS)} FROM events ORDER BY id LIMIT ?"
+    for row in conn.execute(query, (-1 if limit is None else limit,)):
+        yield row_to_event(row)
+
+def all_events(conn: sqlite3.Connection, limit: Optional[int] = None) -> List[EventRow]:
+    """Return stored events oldest first, at most `limit` of them."""
+    return list(iter_events(conn, limit))
+
+def count_events(conn: sqlite3.Connection) -> int:
+    """Return the number of stored events."""
+    return conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+def clear_events(conn: sqlite3.Connection):
+    """Remove all stored events."""
+    with conn:
+        conn.execute("DELETE FROM events")
+
+def find_event(conn: sqlite3.Connection, title: str, date: str):
+    """Return the stored event with the given title and date, or None."""
+    return conn.execute(
+        "SELECT * FROM events WHERE fingerprint = ? AND title = ? AND date = ?",
+        (event_fingerprint(title, date), title, date)
+    ).fetchone()
+
+def insert_event(conn: sqlite3.Connection, event: Dict[str, Any]):
+    """Insert an event dictionary, serializing its weather data (datetimes included) as JSON."""
+    event = {**event, 'fingerprint': event_fingerprint(event.get('title') or "", event.get('date') or "")}
+    values = [event.get(column) for column in COLUMNS]
+    weather_index = COLUMNS.index('weather')
+    if values[weather_index] is not None:
+        values[weather_index] = orjson.dumps(values[weather_index]).decode()
+    conn.execute(
+        f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+        values
+    )
+
+def set_suggestion(conn: sqlite3.Connection, title: str, date: str, suggestion: str):
+    """Set the suggestion of the stored event with the given title and date."""
+    conn.execute("UPDATE events SET suggestion = ? WHERE title = ? AND date = ?", (suggestion, title, date))
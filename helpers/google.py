@@ -1,34 +1,66 @@
 import datetime
+import functools
 import logging
-from urllib.parse import quote
-from typing import Dict, Any, Optional
+import re
+import time
+from urllib.parse import quote, urlencode
+from typing import Optional, Tuple
+
+from helpers.event_store import EventRow
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_LOCATION = 'Washington state, United States'
 
-def get_event_location(event: Dict[str, Any]) -> str:
+GOOGLE_MAPS_URL = "https://maps.google.com/"
+GOOGLE_CALENDAR_URL = "https://calendar.google.com/calendar/render"
+
+MONTH_MAP = {
+    'January': 1, 'February': 2, 'March': 3, 'April': 4,
+    'May': 5, 'June': 6, 'July': 7, 'August': 8,
+    'September': 9, 'October': 10, 'November': 11, 'December': 12
+}
+
+# Dates look like "Saturday, May 3"; the day is optional
+DATE_RE = re.compile(r'\S+?,?\s+(?P<month>[^\s,]+),?(?:\s+(?P<day>\d+))?')
+# Times look like "10:30 AM"
+TIME_RE = re.compile(r'(?P<hour>\d+):(?P<minute>\d+)\s*(?P<meridiem>AM|PM)?', re.IGNORECASE)
+
+YEAR_CACHE_TTL = 60  # Seconds before the current year is read from the clock again
+_year_cache = {'year': 0, 'ts': float('-inf')}
+
+def current_year() -> int:
+    """Return the current year, reading the clock at most once per YEAR_CACHE_TTL seconds."""
+    now = time.monotonic()
+    if now - _year_cache['ts'] > YEAR_CACHE_TTL:
+        _year_cache.update(year=datetime.datetime.now().year, ts=now)
+    return _year_cache['year']
+
+def get_event_location(event: EventRow) -> str:
     """Extract the location from the event data."""
-    if 'is_estimated_address' in event and not bool(event['is_estimated_address']) and 'full_address' in event and event['full_address']:
-        return event['full_address']
-    elif 'is_estimated_address' in event and bool(event['is_estimated_address']) and 'location' in event and event['location']:
-        return event['location']
+    if not event.is_estimated_address and event.full_address:
+        return event.full_address
+    elif event.is_estimated_address and event.location:
+        return event.location
     return DEFAULT_LOCATION
 
+# Many events share a venue, so the links are cached per location
+@functools.lru_cache(maxsize=1024)
 def create_google_maps_link(location: str) -> str:
     """Create a Google Maps link for the given location."""
-    return f"https://maps.google.com/?daddr={quote(location)}"
+    return f"{GOOGLE_MAPS_URL}?{urlencode({'daddr': location}, safe='/', quote_via=quote)}"
 
+@functools.lru_cache(maxsize=512)
 def parse_time(time_str: str) -> Optional[str]:
     """Parse time string into Google Calendar format."""
     try:
-        time_parts = time_str.split(':')
-        if len(time_parts) < 2:
+        match = TIME_RE.search(time_str)
+        if not match:
             return None
             
-        hour = int(time_parts[0])
-        minute = int(time_parts[1].split()[0])
-        is_pm = 'PM' in time_str.upper()
+        hour = int(match['hour'])
+        minute = int(match['minute'])
+        is_pm = (match['meridiem'] or '').upper() == 'PM'
         
         # Convert to 24-hour format
         if is_pm and hour < 12:
@@ -40,34 +72,26 @@ def parse_time(time_str: str) -> Optional[str]:
     except Exception:
         return None
 
-def parse_event_date(event_date: str, event_time: Optional[str] = None) -> dict:
-    """Parse event date and time for calendar formatting."""
+def parse_event_date(event_date: str, event_time: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """Parse event date and time into Google Calendar (start, end) dates, or None if unparseable."""
+    return _parse_event_date(event_date, event_time, current_year())
+
+# Many events share a date and time, so parsed values are cached. The year is part of the
+# key so cached dates roll over with the calendar.
+@functools.lru_cache(maxsize=512)
+def _parse_event_date(event_date: str, event_time: Optional[str], year: int) -> Optional[Tuple[str, str]]:
     try:
-        date_parts = event_date.replace(',', '').split()
-        if len(date_parts) < 2:
-            return {}
+        match = DATE_RE.match(event_date.strip())
+        if not match:
+            return None
             
-        month_name = date_parts[1]
-        day = date_parts[2] if len(date_parts) > 2 else '1'
+        day = match['day'] or '1'
         
         # Convert month name to number
-        month_map = {
-            'January': 1, 'February': 2, 'March': 3, 'April': 4,
-            'May': 5, 'June': 6, 'July': 7, 'August': 8,
-            'September': 9, 'October': 10, 'November': 11, 'December': 12
-        }
-        month_num = month_map.get(month_name, 1)
-        
-        # Use current year
-        current_year = datetime.datetime.now().year
+        month_num = MONTH_MAP.get(match['month'], 1)
         
         # Format date
-        date_str = f"{current_year}{month_num:02d}{int(day):02d}"
-        
-        result = {
-            'start_date': date_str,
-            'end_date': date_str
-        }
+        start_date = end_date = f"{year}{month_num:02d}{int(day):02d}"
         
         # Add time if available
         if event_time:
@@ -75,33 +99,35 @@ def parse_event_date(event_date: str, event_time: Optional[str] = None) -> dict:
             start_time = parse_time(time_parts[0])
             
             if start_time:
-                result['start_date'] += start_time
+                start_date += start_time
                 
                 # Try to get end time
                 if len(time_parts) > 1:
                     end_time = parse_time(time_parts[1])
                     if end_time:
-                        result['end_date'] += end_time
+                        end_date += end_time
                     else:
-                        result['end_date'] += start_time  # Default to same as start time
+                        end_date += start_time  # Default to same as start time
                 else:
-                    result['end_date'] += start_time  # Default to same as start time
+                    end_date += start_time  # Default to same as start time
         
-        return result
+        return start_date, end_date
     except Exception as e:
         logger.error(f"Error parsing event date: {str(e)}")
-        return {}
+        return None
 
-def create_google_calendar_link(event: Dict[str, Any]) -> str:
+def create_google_calendar_link(event: EventRow) -> str:
     """Create a Google Calendar link for the event."""
-    title = quote(event['title'])
-    location = quote(get_event_location(event))
-    description = quote(event.get('description', ''))
-    
-    date_info = parse_event_date(event['date'], event.get('time', ''))
-    if not date_info:
+    dates = parse_event_date(event.date, event.time)
+    if not dates:
         return ""
+    start_date, end_date = dates
     
-    return (f"https://calendar.google.com/calendar/render?action=TEMPLATE&text={title}"
-            f"&dates={date_info['start_date']}/{date_info['end_date']}"
-            f"&details={description}&location={location}")
\ No newline at end of file
+    params = urlencode({
+        'action': 'TEMPLATE',
+        'text': event.title,
+        'dates': f"{start_date}/{end_date}",
+        'details': event.description,
+        'location': get_event_location(event)
+    }, safe='/', quote_via=quote)
+    return f"{GOOGLE_CALENDAR_URL}?{params}"
\ No newline at end of file
@@ -0,0 +1,60 @@
+from typing import Dict, Any, List, Optional
+
+from telegram import MessageEntity
+
+
+def utf16_len(text: str) -> int:
+    """Return the length of the text in UTF-16 code units, the unit Telegram uses for entity offsets."""
+    return len(text.encode('utf-16-le')) // 2
+
+class FormattedText:
+    """Plain message text together with the entities that format it."""
+
+    def __init__(self):
+        # Text pieces are joined once, when the text is read, instead of on every append
+        self._parts: List[str] = []
+        self.entities: List[MessageEntity] = []
+        self._offset = 0
+
+    def __len__(self) -> int:
+        return self._offset
+
+    @property
+    def text(self) -> str:
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    @text.setter
+    def text(self, value: str):
+        self._parts = [value]
+
+    def add(self, text: str, entity_type: Optional[str] = None, url: Optional[str] = None) -> "FormattedText":
+        """Append text, optionally formatted as a single entity of the given type."""
+        length = utf16_len(text)
+        if entity_type and length:
+            self.entities.append(MessageEntity(entity_type, self._offset, length, url=url))
+        self._parts.append(text)
+        self._offset += length
+        return self
+
+    def extend(self, other: "FormattedText") -> "FormattedText":
+        """Append another formatted text, shifting its entities to their new position."""
+        for entity in other.entities:
+            self.entities.append(MessageEntity(entity.type, entity.offset + self._offset, entity.length, url=entity.url))
+        self._parts.append(other.text)
+        self._offset += len(other)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation of the text and its entities."""
+        return {'text': self.text, 'entities': [entity.to_dict() for entity in self.entities]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FormattedText":
+        """Rebuild a formatted text from the output of `to_dict`."""
+        message = cls()
+        message.text = data['text']
+        message.entities = list(MessageEntity.de_list(data['entities']))
+        message._offset = utf16_len(message.text)
+        return message
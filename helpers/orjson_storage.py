@@ -0,0 +1,33 @@
+import os
+from typing import Dict, Any, Optional
+
+import orjson
+from tinydb.storages import JSONStorage
+
+
+class ORJSONStorage(JSONStorage):
+    """TinyDB JSON storage that uses orjson for (de)serialization."""
+
+    def __init__(self, path: str, create_dirs=False, **kwargs):
+        # orjson works with bytes, so the file is always opened in binary mode
+        super().__init__(path, create_dirs=create_dirs, access_mode='rb+', **kwargs)
+
+    def read(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        self._handle.seek(0, os.SEEK_END)
+        if not self._handle.tell():
+            # Empty file, let TinyDB initialize the database
+            return None
+
+        self._handle.seek(0)
+        return orjson.loads(self._handle.read())
+
+    def write(self, data: Dict[str, Dict[str, Any]]):
+        self._handle.seek(0)
+        self._handle.write(orjson.dumps(data))
+
+        # Ensure the file has been written
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+
+        # Remove leftovers in case the file has gotten shorter
+        self._handle.truncate()
@@ -0,0 +1,45 @@
+import os
+import sqlite3
+import time
+from typing import Optional
+
+import orjson
+
+from helpers.message import FormattedText
+
+RENDER_CACHE_DB_PATH = 'data/render_cache.db'
+RENDER_CACHE_MAX_AGE = 60 * 60 * 24 * 7  # Rendered messages are dropped after a week
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rendered (
+    hash BLOB PRIMARY KEY,
+    message BLOB,
+    ts REAL
+)
+"""
+
+def connect(path: str = RENDER_CACHE_DB_PATH) -> sqlite3.Connection:
+    """Open the render cache, creating its table and dropping entries older than RENDER_CACHE_MAX_AGE."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    with conn:
+        conn.execute(SCHEMA)
+        conn.execute("DELETE FROM rendered WHERE ts < ?", (time.time() - RENDER_CACHE_MAX_AGE,))
+    return conn
+
+def get_message(conn: sqlite3.Connection, key: bytes) -> Optional[FormattedText]:
+    """Return the message rendered under `key`, or None."""
+    row = conn.execute("SELECT message FROM rendered WHERE hash = ?", (key,)).fetchone()
+    return FormattedText.from_dict(orjson.loads(row[0])) if row else None
+
+def put_message(conn: sqlite3.Connection, key: bytes, message: FormattedText):
+    """Store a rendered message under `key`; callers commit."""
+    conn.execute(
+        "INSERT OR REPLACE INTO rendered (hash, message, ts) VALUES (?, ?, ?)",
+        (key, orjson.dumps(message.to_dict()), time.time())
+    )
+
+def clear(conn: sqlite3.Connection):
+    """Remove all rendered messages."""
+    with conn:
+        conn.execute("DELETE FROM rendered")
@@ -0,0 +1,42 @@
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Optional
+
+SUGGESTION_CACHE_DB_PATH = 'data/suggestion_cache.db'
+SUGGESTION_CACHE_MAX_AGE = 60 * 60 * 24 * 30  # Suggestions are generated again after a month
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS suggestions (
+    hash BLOB PRIMARY KEY,
+    suggestion TEXT,
+    ts REAL
+)
+"""
+
+def connect(path: str = SUGGESTION_CACHE_DB_PATH) -> sqlite3.Connection:
+    """Open the suggestion cache, creating its table and dropping entries older than SUGGESTION_CACHE_MAX_AGE."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(SCHEMA)
+        conn.execute("DELETE FROM suggestions WHERE ts < ?", (time.time() - SUGGESTION_CACHE_MAX_AGE,))
+    return conn
+
+def prompt_key(model: str, prompt: str) -> bytes:
+    """Return the cache key of a prompt sent to a model."""
+    return hashlib.sha256(f"{model}\n{prompt}".encode()).digest()
+
+def get_suggestion(conn: sqlite3.Connection, key: bytes) -> Optional[str]:
+    """Return the suggestion cached under `key`, or None."""
+    row = conn.execute("SELECT suggestion FROM suggestions WHERE hash = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def put_suggestion(conn: sqlite3.Connection, key: bytes, suggestion: str):
+    """Cache a suggestion under `key`."""
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO suggestions (hash, suggestion, ts) VALUES (?, ?, ?)",
+            (key, suggestion, time.time())
+        )
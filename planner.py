@@ -1,9 +1,11 @@
+import asyncio
 import logging
-import concurrent.futures
+import os
+import sys
 from providers.kcls import KCLSEventProvider
 from providers.parentmap import ParentMapEventProvider
-from tinydb import TinyDB, Query
-import os
+from contextlib import closing
+from helpers import event_store, suggestion_cache
 import litellm
 import json
 from dotenv import load_dotenv
@@ -15,109 +17,240 @@ load_dotenv(".env")
 # Using a free tier model like OpenAI's gpt-3.5-turbo via LiteLLM
 litellm.set_verbose = False
 
-def generate_event_suggestion(event, logger):
-    """Generate suggestions for events based on title, location, description, and weather."""
-    try:
-        # Skip generating suggestions for online events with no weather data
-        if event.format == "Online" and not event.weather:
-            return "This is an online event you can attend from the comfort of your home."
-        
-        # Prepare prompt with event details
-        weather_info = ""
-        if event.weather:
-            weather_info = f"Weather conditions: {event.weather['summary']}, max temp of {event.weather['temp_max']}°C, winds of {event.weather['max_wind_speed']} km/h, and {event.weather['precipitation_probability_text']}."
-        
-        location_info = f"Location: {event.location} ({event.full_address})" if event.format != "Online" else "Location: Online event"
-        
-        prompt = f"""
-        I need a brief suggestion for a family event (2-3 sentences max):
-        
-        Event Title: {event.title}
+# Suggestions are only generated when enabled, since every run then calls the model.
+# Events stored without one get SUGGESTION_PLACEHOLDER, filled in once generation is enabled.
+GENERATE_SUGGESTIONS = os.getenv("GENERATE_SUGGESTIONS", "false").lower() == "true"
+SUGGESTION_PLACEHOLDER = "TODO"
+
+SUGGESTION_MODEL = "gpt-3.5-turbo"  # Usually has a free tier or inexpensive option
+# Requests sent to the model at the same time, to stay within its rate limits
+SUGGESTION_CONCURRENCY = 10
+# Events whose suggestions are asked for in a single request
+SUGGESTION_BATCH_SIZE = 20
+
+ONLINE_SUGGESTION = "This is an online event you can attend from the comfort of your home."
+
+def describe_event(event):
+    """Return the details of an event that suggestions are based on."""
+    weather_info = ""
+    if event.weather:
+        weather_info = f"Weather conditions: {event.weather['summary']}, max temp of {event.weather['temp_max']}°C, winds of {event.weather['max_wind_speed']} km/h, and {event.weather['precipitation_probability_text']}."
+    
+    location_info = f"Location: {event.location} ({event.full_address})" if event.format != "Online" else "Location: Online event"
+    
+    return f"""Event Title: {event.title}
         {location_info}
         Date: {event.date}
         Time: {event.time}
         {weather_info}
         
-        Description: {event.description[:200]}...
+        Description: {event.description[:200]}..."""
+
+def build_suggestion_prompt(event):
+    """Return the prompt asking for a suggestion for a single event."""
+    return f"""
+        I need a brief suggestion for a family event (2-3 sentences max):
+        
+        {describe_event(event)}
         
         Generate a friendly, brief suggestion about attending this event. If it's outdoors and weather is bad (rainy, windy, etc.), suggest indoor alternatives or preparation. Keep it short and helpful.
         """
+
+def build_batch_suggestion_prompt(events):
+    """Return the prompt asking for suggestions for several events, numbered from 1."""
+    event_details = "\n\n        ".join(f"Event {number}:\n        {describe_event(event)}" for number, event in enumerate(events, 1))
+    return f"""
+        I need a brief suggestion for each of these family events (2-3 sentences max each):
+        
+        {event_details}
+        
+        For each event, generate a friendly, brief suggestion about attending it. If it's outdoors and weather is bad (rainy, windy, etc.), suggest indoor alternatives or preparation. Keep them short and helpful.
+        Reply only with a JSON array containing one object per event, with the event number as "id" and the suggestion as "suggestion".
+        """
+
+async def generate_event_suggestion(event, logger, cache=None):
+    """Generate suggestions for events based on title, location, description, and weather."""
+    try:
+        # Skip generating suggestions for online events with no weather data
+        if event.format == "Online" and not event.weather:
+            return ONLINE_SUGGESTION
+        
+        # Prepare prompt with event details
+        prompt = build_suggestion_prompt(event)
+        
+        # Events come back run after run, so identical prompts reuse the cached suggestion
+        key = suggestion_cache.prompt_key(SUGGESTION_MODEL, prompt)
+        if cache is not None:
+            suggestion = suggestion_cache.get_suggestion(cache, key)
+            if suggestion is not None:
+                logger.info(f"Reused cached suggestion for event: {event.title}")
+                return suggestion
         
         # Use a free model through LiteLLM
-        response = litellm.completion(
-            model="gpt-3.5-turbo",  # Usually has a free tier or inexpensive option
+        response = await litellm.acompletion(
+            model=SUGGESTION_MODEL,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=150
         )
         
         suggestion = response.choices[0].message.content.strip()
         logger.info(f"Generated suggestion for event: {event.title}")
+        if cache is not None:
+            suggestion_cache.put_suggestion(cache, key, suggestion)
         return suggestion
     
     except Exception as e:
         logger.error(f"Error generating suggestion for event {event.title}: {str(e)}")
         return "No suggestion available due to an error."
 
-def store_events_in_db(provider_name, events, logger):
-    """Store events in TinyDB, skipping duplicates."""
-    # Ensure db directory exists
-    os.makedirs('data', exist_ok=True)
-    
-    # Open or create the database
-    db = TinyDB('data/events.json')
-    Event = Query()
-    
+async def generate_event_suggestions_batch(events):
+    """Generate suggestions for several events with a single request; missing ones are None."""
+    response = await litellm.acompletion(
+        model=SUGGESTION_MODEL,
+        messages=[{"role": "user", "content": build_batch_suggestion_prompt(events)}],
+        max_tokens=150 * len(events)
+    )
+    suggestions = {
+        int(item['id']): str(item['suggestion']).strip()
+        for item in json.loads(response.choices[0].message.content)
+    }
+    return [suggestions.get(number) or None for number in range(1, len(events) + 1)]
+
+async def generate_event_suggestions(events, logger):
+    """Generate suggestions for several events, batching SUGGESTION_BATCH_SIZE events per request."""
+    semaphore = asyncio.Semaphore(SUGGESTION_CONCURRENCY)
+    suggestions = [None] * len(events)
+
+    with closing(suggestion_cache.connect()) as cache:
+        # Suggestions that need no request are filled in first; cached ones are keyed on the
+        # single-event prompt, so both kinds of request share the cache
+        keys = {}
+        for index, event in enumerate(events):
+            if event.format == "Online" and not event.weather:
+                suggestions[index] = ONLINE_SUGGESTION
+                continue
+            keys[index] = suggestion_cache.prompt_key(SUGGESTION_MODEL, build_suggestion_prompt(event))
+            suggestions[index] = suggestion_cache.get_suggestion(cache, keys[index])
+        pending = [index for index in keys if suggestions[index] is None]
+
+        async def generate_single(index):
+            async with semaphore:
+                suggestions[index] = await generate_event_suggestion(events[index], logger, cache)
+
+        async def generate_batch(indices):
+            try:
+                async with semaphore:
+                    batch_suggestions = await generate_event_suggestions_batch([events[index] for index in indices])
+            except Exception as e:
+                logger.error(f"Error generating suggestions for a batch of {len(indices)} events: {str(e)}")
+                batch_suggestions = [None] * len(indices)
+            for index, suggestion in zip(indices, batch_suggestions):
+                if suggestion is not None:
+                    suggestions[index] = suggestion
+                    suggestion_cache.put_suggestion(cache, keys[index], suggestion)
+            # Events the batch reply did not cover are asked for one by one
+            await asyncio.gather(*(generate_single(index) for index in indices if suggestions[index] is None))
+
+        batches = [pending[start:start + SUGGESTION_BATCH_SIZE] for start in range(0, len(pending), SUGGESTION_BATCH_SIZE)]
+        await asyncio.gather(*(generate_batch(indices) for indices in batches))
+        logger.info(f"Generated suggestions for {len(pending)} events in {len(batches)} batches")
+
+    return suggestions
+
+def store_events_in_db(conn, provider_name, events, logger):
+    """Store events in the SQLite events database, skipping duplicates; the caller commits."""
     stored_count = 0
     skipped_count = 0
     
+    # Find the events that need a suggestion first, so they can all be generated at once
+    pending = []
+    seen_keys = set()
     for event in events:
-        # Generate suggestion for the event
-        #logger.info(f"Generating suggestion for event: {event.title}")
-        suggestion = "TODO" #generate_event_suggestion(event, logger)
-        
-        # Convert event to dictionary for storage
-        event_dict = event.__dict__.copy()
-        
-        # Handle non-serializable objects
-        if 'weather' in event_dict and event_dict['weather']:
-            if 'datetime' in event_dict['weather']:
-                event_dict['weather']['datetime'] = event_dict['weather']['datetime'].isoformat()
-        
-        # Add provider information and suggestion
-        event_dict['provider'] = provider_name
-        event_dict['suggestion'] = suggestion
-        
         # Check if this event already exists (by title and date)
-        existing = db.search((Event.title == event.title) & (Event.date == event.date))
-        
+        key = (event.title, event.date)
+        existing = event_store.find_event(conn, event.title, event.date)
+        has_suggestion = existing and existing['suggestion'] and not (
+            GENERATE_SUGGESTIONS and existing['suggestion'] == SUGGESTION_PLACEHOLDER
+        )
+        if key in seen_keys or has_suggestion:
+            skipped_count += 1
+            continue
+        seen_keys.add(key)
+        pending.append((event, existing))
+    
+    # Generate suggestions for the events
+    if GENERATE_SUGGESTIONS and pending:
+        logger.info(f"Generating suggestions for {len(pending)} events")
+        suggestions = asyncio.run(generate_event_suggestions([event for event, _ in pending], logger))
+    else:
+        suggestions = [SUGGESTION_PLACEHOLDER] * len(pending)
+    
+    for (event, existing), suggestion in zip(pending, suggestions):
         if not existing:
+            # Convert event to dictionary for storage; datetimes in the weather data are
+            # serialized by the event store
+            event_dict = event.to_db_dict()
+            
+            # Add provider information and suggestion
+            event_dict['provider'] = provider_name
+            event_dict['suggestion'] = suggestion
+            
             # Store new event
-            db.insert(event_dict)
+            event_store.insert_event(conn, event_dict)
             stored_count += 1
         else:
             # Update existing event with suggestion if it doesn't have one
-            if not existing[0].get('suggestion'):
-                db.update({'suggestion': suggestion}, (Event.title == event.title) & (Event.date == event.date))
-                logger.info(f"Updated existing event with suggestion: {event.title}")
+            event_store.set_suggestion(conn, event.title, event.date, suggestion)
+            logger.info(f"Updated existing event with suggestion: {event.title}")
             skipped_count += 1
     
     logger.info(f"Provider {provider_name}: Stored {stored_count} new events, skipped {skipped_count} duplicates")
     return stored_count, skipped_count
 
+def print_events(provider_name, events):
+    """Print a summary of a provider's events, written to stdout at once."""
+    lines = [f"Provider: {provider_name}"]
+    for event in events:
+        lines.append(f"Title: {event.title}")
+        lines.append(f"Status: {event.status}")
+        lines.append(f"Date: {event.date}")
+        lines.append(f"Time: {event.time}")
+        lines.append(f"Cost: {event.cost}")
+        if event.format != "Online":
+            lines.append(f"Location: {event.location} ({event.full_address if event.full_address else 'Incomplete address'})")
+        else:
+            lines.append(f"Location: Online")
+
+        if event.weather:
+            lines.append(f"Weather for {event.weather['datetime']}: {event.weather['summary']} (max temperature of {event.weather['temp_max']}°C, winds of {event.weather['max_wind_speed']} km/h, and {event.weather['precipitation_probability_text']})")
+        else:
+            lines.append("Weather data not available.")
+        
+        lines.append(f"Link: {event.link}")
+        lines.append(f"Description: {event.description}")
+        
+        # Display the suggestion
+        if hasattr(event, 'suggestion'):
+            lines.append(f"Suggestion: {event.suggestion}")
+        lines.append("")
+    sys.stdout.write("\n".join(lines) + "\n")
+
+async def download_all_events(providers, logger):
+    """Download events from all providers concurrently; a failing provider does not stop the others."""
+    results = await asyncio.gather(*(provider.download_events() for provider in providers), return_exceptions=True)
+    for provider, result in zip(providers, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error downloading events from {type(provider).__name__}: {str(result)}")
+
 def main(logger):
+    """Fetch events from all providers, store the new ones and return how many were stored."""
     logger.info("Fetching events from providers")
 
     kcls = KCLSEventProvider()
     parentmap = ParentMapEventProvider()
     
-    # Run downloads concurrently using ThreadPoolExecutor
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        # Submit both download tasks
-        kcls_future = executor.submit(kcls.download_events)
-        parentmap_future = executor.submit(parentmap.download_events)
-        
-        # Wait for both to complete
-        concurrent.futures.wait([kcls_future, parentmap_future])
+    # Run downloads concurrently on one event loop
+    asyncio.run(download_all_events([kcls, parentmap], logger))
     
     provider_events = {
         "KCLS": kcls.events,
@@ -128,38 +261,19 @@ def main(logger):
     total_stored = 0
     total_skipped = 0
     
+    # One connection for all providers; their events are committed together
+    with closing(event_store.connect()) as conn, conn:
+        for provider, events in provider_events.items():
+            stored, skipped = store_events_in_db(conn, provider, events, logger)
+            total_stored += stored
+            total_skipped += skipped
+    
     for provider, events in provider_events.items():
-        stored, skipped = store_events_in_db(provider, events, logger)
-        total_stored += stored
-        total_skipped += skipped
-        
-        print(f"Provider: {provider}")
-        for event in events:
-            print(f"Title: {event.title}")
-            print(f"Status: {event.status}")
-            print(f"Date: {event.date}")
-            print(f"Time: {event.time}")
-            print(f"Cost: {event.cost}")
-            if event.format != "Online":
-                print(f"Location: {event.location} ({event.full_address if event.full_address else 'Incomplete address'})")
-            else:
-                print(f"Location: Online")
-
-            if event.weather:
-                print(f"Weather for {event.weather['datetime']}: {event.weather['summary']} (max temperature of {event.weather['temp_max']}°C, winds of {event.weather['max_wind_speed']} km/h, and {event.weather['precipitation_probability_text']})")
-            else:
-                print("Weather data not available.")
-            
-            print(f"Link: {event.link}")
-            print(f"Description: {event.description}")
-            
-            # Display the suggestion
-            if hasattr(event, 'suggestion'):
-                print(f"Suggestion: {event.suggestion}")
-            print()
+        print_events(provider, events)
     
     logger.info(f"Database summary: Added {total_stored} new events, skipped {total_skipped} duplicates")
     print(f"\nDatabase summary: Added {total_stored} new events, skipped {total_skipped} duplicates")
+    return total_stored
 
 if __name__ == "__main__":
     main(logging.getLogger(__name__))
\ No newline at end of file
@@ -1,11 +1,46 @@
-from datetime import datetime, timedelta
+import concurrent.futures
+import dataclasses
+from datetime import datetime, timedelta, timezone
 import logging
+import threading
+from zoneinfo import ZoneInfo
+
+from cachetools import TTLCache
+
 from geo.geocode import geocode_address
 from weather.weather_forecast import get_weather_forecast
 
 logger = logging.getLogger(__name__)
 
+PACIFIC = ZoneInfo('America/Los_Angeles')
+
+ENRICH_WORKERS = 8  # Events whose address and weather are looked up at the same time
+WEATHER_GRID_DECIMALS = 2  # Coordinates are rounded to ~1 km, so nearby events share a forecast
+AREA_FORECAST_TTL = 60 * 60  # 1 hour in seconds
+
+# Forecasts shared by nearby events. Only successful lookups are kept, so a transient failure is
+# retried by the next event; entries expire because the planner worker outlives a single run.
+AREA_FORECASTS = TTLCache(maxsize=256, ttl=AREA_FORECAST_TTL)
+AREA_FORECASTS_LOCK = threading.Lock()
+
+def get_area_forecast(lat, lon, start):
+    """Return the forecast around a point for the two hours from `start`, shared by events nearby."""
+    key = (lat, lon, start)
+    with AREA_FORECASTS_LOCK:
+        forecast = AREA_FORECASTS.get(key)
+    if forecast is None:
+        forecast = get_weather_forecast((lat, lon), start, start + timedelta(hours=2))
+        if forecast is not None:
+            with AREA_FORECASTS_LOCK:
+                AREA_FORECASTS[key] = forecast
+    return forecast
+
 class Event:
+    __slots__ = (
+        'title', 'link', 'date', 'cost', 'location', 'description', 'status', 'time', 'provider', 'format',
+        'full_address', 'lat', 'lon', 'is_estimated_address', 'weather'
+    )
+
     def __init__(self, title, link, date, cost, location, description, status="Confirmed", time=None, provider=None, format="Onsite"):
         self.title = title
         self.link = link
@@ -23,6 +58,10 @@ class Event:
     def __repr__(self):
         return f"{self.provider} event: {self.title} on {self.date} at {self.location}"
 
+    def to_db_dict(self):
+        """Return the event fields as a dictionary for the event store."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
     def get_full_address(self):
         if self.format != "Online":
             return geocode_address(self.location)
@@ -35,69 +74,49 @@ class Event:
                 try:
                     # Get forecast for the event
                     event_datetime = datetime.utcnow()
-                    # Estimate event duration - default to 2 hours
-                    event_end = event_datetime + timedelta(hours=2)
-                    weather_forecast = get_weather_forecast((self.lat, self.lon), event_datetime, event_end)
+                    # Estimate event duration - default to 2 hours. Forecasts are hourly, so
+                    # events in the same area and hour share one.
+                    forecast_start = event_datetime.replace(minute=0, second=0, microsecond=0)
+                    weather_forecast = get_area_forecast(
+                        round(self.lat, WEATHER_GRID_DECIMALS), round(self.lon, WEATHER_GRID_DECIMALS), forecast_start
+                    )
                     
                     if weather_forecast:
                         # If we have hourly data for the specific time, include it
                         hourly_weather = None
-                        if 'hourly' in weather_forecast and weather_forecast['hourly']:
-                            for hour_data in weather_forecast['hourly']:
-                                hour_time = datetime.fromisoformat(hour_data['time'].replace('Z', '+00:00'))
-                                if hour_time.hour == event_datetime.hour:
-                                    hourly_weather = hour_data
-                                    break
+                        for hour_data in weather_forecast.hourly:
+                            hour_time = datetime.fromisoformat(hour_data.time.replace('Z', '+00:00'))
+                            if hour_time.hour == event_datetime.hour:
+                                hourly_weather = dataclasses.asdict(hour_data)
+                                break
                         
-                        # Convert UTC to Pacific time (PST/PDT)
-                        # Pacific time is UTC-8 in standard time, UTC-7 in daylight saving time
-                        # Check if we're in daylight saving time
-                        is_dst = self._is_daylight_saving(event_datetime)
-                        pacific_datetime = event_datetime - timedelta(hours=7 if is_dst else 8)
+                        # Convert UTC to Pacific time (PST/PDT), kept naive as before
+                        pacific_datetime = event_datetime.replace(tzinfo=timezone.utc).astimezone(PACIFIC).replace(tzinfo=None)
                         
+                        daily = weather_forecast.daily
                         return {
                             'datetime': pacific_datetime,
-                            'summary': weather_forecast['daily']['summary'],
-                            'temp_max': weather_forecast['daily']['temp_max'],
-                            'temp_min': weather_forecast['daily']['temp_min'],
-                            'max_wind_speed': weather_forecast['daily']['max_wind_speed'],
-                            'precipitation_mm': weather_forecast['daily']['precipitation_mm'],
-                            'precipitation_probability_text': weather_forecast['daily']['precipitation_probability_text'],
+                            'summary': daily.summary,
+                            'temp_max': daily.temp_max,
+                            'temp_min': daily.temp_min,
+                            'max_wind_speed': daily.max_wind_speed,
+                            'precipitation_mm': daily.precipitation_mm,
+                            'precipitation_probability_text': daily.precipitation_probability_text,
                             'hourly': hourly_weather  # This will be None if no specific hourly data found
                         }
                 except Exception as e:
                     logger.error(f"Error getting weather forecast: {e}")
         return None
 
-    def _is_daylight_saving(self, dt):
-        """Simple helper method to determine if a date is in daylight saving time in US Pacific timezone."""
-        # Basic rules for US Pacific DST:
-        # Starts: Second Sunday in March
-        # Ends: First Sunday in November
-        year = dt.year
-        
-        # Calculate DST start for the year
-        # 2nd Sunday in March
-        march_date = datetime(year, 3, 1)
-        # Find the first Sunday
-        days_to_add = (6 - march_date.weekday()) % 7
-        first_sunday = march_date + timedelta(days=days_to_add)
-        # Second Sunday
-        dst_start = first_sunday + timedelta(days=7)
-        dst_start = dst_start.replace(hour=2)  # 2:00 AM
-        
-        # Calculate DST end for the year
-        # 1st Sunday in November
-        november_date = datetime(year, 11, 1)
-        days_to_add = (6 - november_date.weekday()) % 7
-        dst_end = november_date + timedelta(days=days_to_add)
-        dst_end = dst_end.replace(hour=2)  # 2:00 AM
-        
-        return dst_start <= dt < dst_end
-
 class EventProvider:
     def __init__(self):
         self.events = []
 
-    def download_events(self):
+    @staticmethod
+    def create_events(raw_events):
+        """Create events from dicts of their fields, looking up addresses and weather concurrently."""
+        with concurrent.futures.ThreadPoolExecutor(max_workers=ENRICH_WORKERS) as executor:
+            return list(executor.map(lambda raw_event: Event(**raw_event), raw_events))
+
+    async def download_events(self):
         pass
@@ -1,33 +1,27 @@
 import asyncio
+import re
 from playwright.async_api import async_playwright
 from bs4 import BeautifulSoup
 import logging
-from .event import Event, EventProvider
+from .event import EventProvider
 
 logger = logging.getLogger(__name__)
 
+EVENTS_LOAD_TIMEOUT = 30000  # Milliseconds to wait for the event list to render
+
+# Screen reader dates read like "on Saturday, May 3" or "from Saturday, May 3"
+DATE_PREFIX_RE = re.compile(r"on |from ")
+
 class KCLSEventProvider(EventProvider):
     def __init__(self):
         super().__init__()
 
-    def download_events(self):
+    async def download_events(self):
         logger.info("Downloading events from KCLS...")
-        raw_events = asyncio.run(self.__scrape_upcoming_events())
-        for event in raw_events:
-            event = Event(
-                provider='KCLS',
-                title=event['title'],
-                status=event['status'],
-                link=event['link'],
-                date=event['date'],
-                time=event['time'],
-                cost=event['cost'],
-                location=event['location'],
-                description=event['description'],
-                format=event['format']
-            )
-            self.events.append(event)
-        
+        raw_events = await self.__scrape_upcoming_events()
+        # Creating events looks up addresses and weather, which blocks, so it runs in a thread
+        raw_events = [{**event, 'provider': 'KCLS'} for event in raw_events]
+        self.events.extend(await asyncio.to_thread(self.create_events, raw_events))
         logger.info(f"{len(self.events)} events downloaded from KCLS.")
 
     async def __scrape_upcoming_events(self):
@@ -38,13 +32,16 @@ class KCLSEventProvider(EventProvider):
             page = await browser.new_page()
             # Spanish/English events for kids 8 and under:
             logger.info("Checking for Spanish/English events for kids 8 and under...")
-            await page.goto('https://kcls.bibliocommons.com/v2/events?audiences=572b6201717c23254b000013%2C572b6201717c23254b000014%2C572b6201717c23254b000012&languages=5654e8049967fa8d27000012%2C5654e8049967fa8d27000014', wait_until='networkidle')
-            await page.wait_for_load_state('networkidle')
+            await page.goto('https://kcls.bibliocommons.com/v2/events?audiences=572b6201717c23254b000013%2C572b6201717c23254b000014%2C572b6201717c23254b000012&languages=5654e8049967fa8d27000012%2C5654e8049967fa8d27000014', wait_until='domcontentloaded')
 
+            # Events are rendered client-side from API responses, so the list is complete once the
+            # network goes idle. A timeout is raised, failing the provider instead of storing a partial list.
             logger.info("Waiting for page to load...")
-            content = await page.content()
+            await page.wait_for_load_state('networkidle', timeout=EVENTS_LOAD_TIMEOUT)
+            # Only the event markup is serialized out of the browser, not the whole page
+            event_html = await page.eval_on_selector_all('div.event-details', 'divs => divs.map(div => div.outerHTML)')
             logger.info("Page loaded. Parsing content...")
-            soup = BeautifulSoup(content, 'html.parser')
+            soup = BeautifulSoup(''.join(event_html), 'lxml')
 
             events = []
 
@@ -60,13 +57,13 @@ class KCLSEventProvider(EventProvider):
             for event_div in event_divs:
                 # Extract title
                 title_tag = event_div.find('h3', class_='cp-heading')
-                title = title_tag.find('a', class_='cp-link').get_text(strip=True) if title_tag and title_tag.find('a', class_='cp-link') else ''
+                title_link = title_tag.find('a', class_='cp-link') if title_tag else None
+                title = title_link.get_text(strip=True) if title_link else ''
                 
                 # Extract status
-                status_badge = title_tag.find('span', class_='event-badge')
-                status = 'Confirmed'  # Default status
-                if status_badge and status_badge.find('div', class_='cp-badge'):
-                    status = status_badge.find('div', class_='cp-badge').get_text(strip=True)
+                status_badge = title_tag.find('span', class_='event-badge') if title_tag else None
+                badge = status_badge.find('div', class_='cp-badge') if status_badge else None
+                status = badge.get_text(strip=True) if badge else 'Confirmed'  # Confirmed by default
                 
                 # Extract link
                 link_tag = event_div.find('a', class_='cp-link', attrs={'data-key': 'event-link'})
@@ -82,17 +79,27 @@ class KCLSEventProvider(EventProvider):
                     if 'All day' in date_text:
                         time = 'All day'
                         
+                    # Sort the spans in a single pass: screen reader messages hold the detailed
+                    # date and time, hidden spans the visible ones
+                    date_screen_reader = []
+                    time_spans = []
+                    for span in date_div.find_all('span'):
+                        if 'cp-screen-reader-message' in span.get('class', ()):
+                            date_screen_reader.append(span)
+                        if span.get('aria-hidden') == 'true':
+                            time_spans.append(span)
+
                     # Try to get the more detailed date from the screen reader message
-                    date_screen_reader = date_div.find_all('span', class_='cp-screen-reader-message')
                     if date_screen_reader and len(date_screen_reader) >= 1:
                         date = date_screen_reader[0].get_text(strip=True)
                         # Remove prefix if present
-                        date = date.replace('on ', '').replace('from ', '')
+                        date = DATE_PREFIX_RE.sub('', date)
                         
                         # Check if there's a time component (usually the second screen reader message)
                         if len(date_screen_reader) >= 2 and not time:  # Only set if not already "All day"
                             time_text = date_screen_reader[1].get_text(strip=True)
-                            if 'am' in time_text.lower() or 'pm' in time_text.lower():
+                            lowered = time_text.lower()
+                            if 'am' in lowered or 'pm' in lowered:
                                 time = time_text
                     else:
                         # Fallback to the visible date
@@ -102,10 +109,10 @@ class KCLSEventProvider(EventProvider):
                             
                             # Try to extract time from visible text if not already "All day"
                             if not time:
-                                time_spans = date_div.find_all('span', attrs={'aria-hidden': 'true'})
                                 for span in time_spans:
                                     span_text = span.get_text(strip=True)
-                                    if 'am' in span_text.lower() or 'pm' in span_text.lower():
+                                    lowered = span_text.lower()
+                                    if 'am' in lowered or 'pm' in lowered:
                                         time = span_text
                 
                 # Extract location
@@ -120,11 +127,9 @@ class KCLSEventProvider(EventProvider):
                 
                 # Extract description
                 desc_div = event_div.find('div', class_='cp-event-description')
-                description = ''
-                if desc_div and desc_div.find('p'):
-                    # Get text from all paragraphs in the description
-                    paragraphs = desc_div.find_all('p')
-                    description = ' '.join([p.get_text(strip=True) for p in paragraphs])
+                # Get text from all paragraphs in the description
+                paragraphs = desc_div.find_all('p') if desc_div else []
+                description = ' '.join([p.get_text(strip=True) for p in paragraphs])
                 
                 raw_event = {
                     'title': title,
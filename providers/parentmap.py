@@ -1,69 +1,51 @@
+import asyncio
 import re
-import requests
-from bs4 import BeautifulSoup
-from .event import Event, EventProvider
+import httpx
+import lxml.html
+from .event import EventProvider
 import logging
 
 logger = logging.getLogger(__name__)
 
+WEEKENDER_URL = "https://www.parentmap.com/article/the-weekender"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0"
+}
+FETCH_TIMEOUT = 10  # Seconds
+
+# Weekender titles are numbered, e.g. "1. Spring festival"
+LEADING_NUMBER_RE = re.compile(r"^\d+\.\s*")
+
 class ParentMapEventProvider(EventProvider):
     def __init__(self):
         self.events = []
 
-    def download_events(self):
+    async def download_events(self):
         logger.info("Downloading events from ParentMap...")
-        self.events = self.__scrape_weekender_events()
+        content = await self.__fetch_weekender_page()
+        # Creating events looks up addresses and weather, which blocks, so it runs in a thread
+        self.events = await asyncio.to_thread(self.__scrape_weekender_events, content)
         logger.info(f"{len(self.events)} events downloaded from ParentMap.")
 
-    def __extract_metadata(self, raw_html, title, link):
-        # Parse HTML for metadata extraction
-        soup = BeautifulSoup(raw_html, 'html.parser')
-        
+    def __extract_metadata(self, paragraph, title, link):
         # Clean title (remove leading number and period)
-        cleaned_title = re.sub(r"^\d+\.\s*", "", title)
-        
-        # Find all the strong tags which contain our metadata labels
-        strong_tags = soup.find_all('strong')
+        cleaned_title = LEADING_NUMBER_RE.sub("", title)
         
         date = cost = location = description = None
         
-        for tag in strong_tags:
-            label_text = tag.get_text().strip().lower()
+        # The strong tags contain our metadata labels, followed by their values
+        for tag in paragraph.iterfind('.//strong'):
+            label_text = tag.text_content().strip().lower()
             if 'date:' in label_text:
-                # Get the text after this strong tag until the next <br>
-                date_text = []
-                next_elem = tag.next_sibling
-                while next_elem and not (hasattr(next_elem, 'name') and next_elem.name == 'br'):
-                    if isinstance(next_elem, str):
-                        date_text.append(next_elem)
-                    next_elem = next_elem.next_sibling if hasattr(next_elem, 'next_sibling') else None
-                date = ''.join(date_text).strip()
-                
+                date = self.__text_until_br(tag)
             elif 'cost:' in label_text:
-                # Get the text after this strong tag until the next <br>
-                cost_text = []
-                next_elem = tag.next_sibling
-                while next_elem and not (hasattr(next_elem, 'name') and next_elem.name == 'br'):
-                    if isinstance(next_elem, str):
-                        cost_text.append(next_elem)
-                    next_elem = next_elem.next_sibling if hasattr(next_elem, 'next_sibling') else None
-                cost = ''.join(cost_text).strip()
-                
+                cost = self.__text_until_br(tag)
             elif 'location:' in label_text:
-                # Get the text after this strong tag until the next <br>
-                location_text = []
-                next_elem = tag.next_sibling
-                while next_elem and not (hasattr(next_elem, 'name') and next_elem.name == 'br'):
-                    if isinstance(next_elem, str) or (hasattr(next_elem, 'name') and next_elem.name == 'a'):
-                        if hasattr(next_elem, 'get_text'):
-                            location_text.append(next_elem.get_text())
-                        else:
-                            location_text.append(str(next_elem))
-                    next_elem = next_elem.next_sibling if hasattr(next_elem, 'next_sibling') else None
-                location = ''.join(location_text).strip()
+                # Locations are often links to a map
+                location = self.__text_until_br(tag, include_links=True)
         
         # Extract the description (all text after the last <br><br>)
-        br_tags = soup.find_all('br')
+        br_tags = paragraph.findall('.//br')
         
         description = ""
         if len(br_tags) >= 4:  # We need at least 4 <br> tags to have two <br><br> pairs
@@ -71,13 +53,12 @@ class ParentMapEventProvider(EventProvider):
             last_br = br_tags[-1]
             
             # Get all content (text nodes and elements) after the last <br>
-            for sibling in last_br.next_siblings:
-                if isinstance(sibling, str):
-                    description += sibling
-                elif hasattr(sibling, 'get_text'):
-                    description += sibling.get_text()
+            description_parts = [last_br.tail or ""]
+            for sibling in last_br.itersiblings():
+                description_parts.append(sibling.text_content())
+                description_parts.append(sibling.tail or "")
                     
-            description = description.strip()
+            description = "".join(description_parts).strip()
         
         raw_event = {
             'provider': 'ParentMap',
@@ -91,19 +72,32 @@ class ParentMapEventProvider(EventProvider):
 
         return raw_event
 
-    def __scrape_weekender_events(self):
-        URL = "https://www.parentmap.com/article/the-weekender"
-        HEADERS = {
-            "User-Agent": "Mozilla/5.0"
-        }
+    @staticmethod
+    def __text_until_br(tag, include_links=False):
+        """Return the text that follows a tag up to the next <br>, optionally including the text of links."""
+        # Text between elements is stored as the tail of the element before it
+        text_parts = [tag.tail or ""]
+        for sibling in tag.itersiblings():
+            if sibling.tag == 'br':
+                break
+            if include_links and sibling.tag == 'a':
+                text_parts.append(sibling.text_content())
+            text_parts.append(sibling.tail or "")
+        return "".join(text_parts).strip()
+
+    async def __fetch_weekender_page(self):
+        async with httpx.AsyncClient(http2=True, headers=HEADERS, timeout=FETCH_TIMEOUT, follow_redirects=True) as client:
+            response = await client.get(WEEKENDER_URL)
+        return response.content
 
-        response = requests.get(URL, headers=HEADERS)
-        soup = BeautifulSoup(response.content, "html.parser")
+    def __scrape_weekender_events(self, content):
+        # The page is parsed once; event paragraphs are read from this tree directly
+        tree = lxml.html.fromstring(content)
 
         # Step 1: Find the main content div
-        content_div = soup.find("div", class_="field_content_sections")
+        content_div = next((elem for elem in tree.find_class("field_content_sections") if elem.tag == "div"), None)
 
-        if not content_div:
+        if content_div is None:
             logger.error("Unable to find the content section on the ParentMap webpage.")
             return []
         
@@ -114,19 +108,18 @@ class ParentMapEventProvider(EventProvider):
         current_title = ""
         current_link = None
 
-        for elem in content_div.find_all(["h3", "p"], recursive=True):
-            if elem.name == "h3":
+        for elem in content_div.iter("h3", "p"):
+            if elem.tag == "h3":
                 # This is a new event title
-                current_title = elem.get_text(strip=True)
-                current_link = elem.find("a")["href"] if elem.find("a") else None
-            elif elem.name == "p" and current_title:
-                # This is the event description paragraph
-                # Instead of extracting text, store the raw HTML
-                raw_html = str(elem)
+                current_title = "".join(text.strip() for text in elem.itertext())
+                link_tag = elem.find(".//a")
+                current_link = link_tag.get("href") if link_tag is not None else None
+            elif elem.tag == "p" and current_title:
+                # This is the event description paragraph, kept as an element for metadata extraction
                 events.append({
                     "title": current_title,
                     "link": current_link,
-                    "raw_html": raw_html
+                    "paragraph": elem
                 })
 
                 logger.info(f"Event found: {current_title}")
@@ -135,16 +128,16 @@ class ParentMapEventProvider(EventProvider):
                 current_title = ""
                 current_link = None
         
-        # Process each event's raw HTML to extract structured data
+        # Process each event's paragraph to extract structured data
         structured_events = [
-            self.__extract_metadata(event["raw_html"], event["title"], event["link"]) 
+            self.__extract_metadata(event["paragraph"], event["title"], event["link"]) 
             for event in events
         ]
         
         # Filter out events with missing required fields
-        filtered_events = [
-            Event(**raw_event) for raw_event in structured_events
+        filtered_events = self.create_events([
+            raw_event for raw_event in structured_events
             if raw_event["date"] and raw_event["cost"] and raw_event["location"]
-        ]
+        ])
 
         return filtered_events
@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+def enter_scratch_directory() -> Path:
+    """Work in a temporary directory until the calling test module finishes, since modules keep their data under data/."""
+    original_cwd = os.getcwd()
+    scratch = tempfile.TemporaryDirectory()
+    os.chdir(scratch.name)
+    # Cleanups run last in, first out: leave the directory before removing it
+    unittest.addModuleCleanup(scratch.cleanup)
+    unittest.addModuleCleanup(os.chdir, original_cwd)
+    return Path(scratch.name)
@@ -0,0 +1,176 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+import orjson
+
+from support import enter_scratch_directory
+
+bot = None
+
+def setUpModule():
+    # The bot opens its databases under data/ when imported, so it is imported in a scratch directory
+    global bot
+    enter_scratch_directory()
+    import bot as bot_module
+    bot = bot_module
+    unittest.addModuleCleanup(bot.authorized_users_db.close)
+    unittest.addModuleCleanup(bot.render_cache_db.close)
+    unittest.addModuleCleanup(bot.events_db.close)
+
+def slow_planner_run() -> int:
+    """Stand-in for the planner worker that stores three new events."""
+    time.sleep(0.1)
+    return 3
+
+class RunPlannerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        patches = [
+            mock.patch.object(bot, 'PLANNER_POOL', self.pool),
+            mock.patch.object(bot, 'PLANNER_RUN', None),
+            mock.patch.object(bot, '_run_planner_entry', slow_planner_run),
+            mock.patch.object(bot, 'notify_users_of_new_events', mock.AsyncMock()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.pool.shutdown)
+
+    async def test_concurrent_callers_share_one_notification(self):
+        app = object()
+        counts = await asyncio.gather(bot.run_planner(app), bot.run_planner(app))
+        self.assertEqual(counts, [3, 3])
+        bot.notify_users_of_new_events.assert_awaited_once_with(app, 3)
+
+    async def test_cache_is_cleared_off_the_event_loop(self):
+        threads = []
+        with mock.patch.object(bot, 'clear_events_cache', lambda: threads.append(threading.current_thread())):
+            await bot.run_planner()
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    async def test_run_without_app_does_not_notify(self):
+        self.assertEqual(await bot.run_planner(), 3)
+        bot.notify_users_of_new_events.assert_not_awaited()
+
+class RenderEventTest(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(bot, 'EVENT_MESSAGE_CACHE', {})
+        patch.start()
+        self.addCleanup(patch.stop)
+        bot.render_cache.clear(bot.render_cache_db)
+        self.event = bot.EventRow(title="Story time", date="2025-05-03", fingerprint="0123456789abcdef")
+
+    def test_identical_events_are_rendered_once(self):
+        with mock.patch.object(bot, 'format_event_message', wraps=bot.format_event_message) as format_message:
+            first = bot.render_event(self.event)
+            bot.EVENT_MESSAGE_CACHE.clear()
+            second = bot.render_event(self.event)
+        self.assertEqual(format_message.call_count, 1)
+        self.assertEqual(first.to_dict(), second.to_dict())
+
+    def test_new_format_version_renders_again(self):
+        with mock.patch.object(bot, 'format_event_message', wraps=bot.format_event_message) as format_message:
+            bot.render_event(self.event)
+            with mock.patch.object(bot, 'RENDER_FORMAT_VERSION', bot.RENDER_FORMAT_VERSION + 1):
+                bot.render_event(self.event)
+        self.assertEqual(format_message.call_count, 2)
+
+    def test_new_year_renders_again(self):
+        # Calendar links are dated with the current year
+        with mock.patch.object(bot, 'format_event_message', wraps=bot.format_event_message) as format_message:
+            bot.render_event(self.event)
+            with mock.patch.object(bot, 'current_year', return_value=bot.current_year() + 1):
+                bot.render_event(self.event)
+        self.assertEqual(format_message.call_count, 2)
+
+    def test_rendered_events_key_changes_with_the_year(self):
+        key = bot.rendered_events_key()
+        with mock.patch.object(bot, 'current_year', return_value=bot.current_year() + 1):
+            self.assertNotEqual(bot.rendered_events_key(), key)
+
+class RenderedEventsTest(unittest.TestCase):
+    def setUp(self):
+        bot.clear_events_cache(include_messages=True)
+        bot.clear_events()
+        self.addCleanup(bot.clear_events)
+
+    def test_events_are_rendered_once_per_key(self):
+        with bot.events_db:
+            bot.event_store.insert_event(bot.events_db, {'title': "Story time", 'date': "May 3, 2025"})
+        with mock.patch.object(bot, 'render_event', wraps=bot.render_event) as render:
+            first = bot.get_rendered_events()
+            second = bot.get_rendered_events()
+        self.assertEqual(render.call_count, 1)
+        self.assertIs(first, second)
+        self.assertEqual(first[0][0], int(bot.event_store.event_fingerprint("Story time", "May 3, 2025"), 16))
+
+    def test_expired_entry_is_rendered_again(self):
+        # An entry that expires after the key is computed must not raise KeyError
+        with mock.patch.object(bot, 'EVENTS_CACHE', bot.TTLCache(maxsize=1, ttl=0)):
+            self.assertEqual(bot.get_rendered_events(), [])
+
+class UserHistoryTest(unittest.TestCase):
+    USER_ID = 1001
+
+    def setUp(self):
+        bot.clear_events_cache(include_messages=True)
+        bot.clear_events()
+        self.addCleanup(bot.clear_events)
+        self.addCleanup(self.remove_history)
+
+    def remove_history(self):
+        bot.close_user_history(self.USER_ID)
+        if os.path.exists(bot.get_user_db_path(self.USER_ID)):
+            os.remove(bot.get_user_db_path(self.USER_ID))
+
+    def add_event(self, title):
+        with bot.events_db:
+            bot.event_store.insert_event(bot.events_db, {'title': title, 'date': "May 3, 2025"})
+
+    def new_titles(self):
+        return [message.text.splitlines()[0] for message in bot.fetch_new_events(self.USER_ID)]
+
+    def test_events_are_shown_once(self):
+        self.add_event("Story time")
+        self.assertEqual(self.new_titles(), ["📌 Story time"])
+        self.assertEqual(self.new_titles(), [])
+
+        self.add_event("Lego club")
+        self.assertEqual(self.new_titles(), ["📌 Lego club"])
+
+    def test_seen_events_are_kept_on_disk(self):
+        self.add_event("Story time")
+        self.new_titles()
+        bot.close_user_history(self.USER_ID)
+
+        with open(bot.get_user_db_path(self.USER_ID), encoding='utf-8') as f:
+            self.assertEqual(f.read(), bot.event_store.event_fingerprint("Story time", "May 3, 2025") + "\n")
+        self.assertEqual(self.new_titles(), [])
+
+    def test_files_with_raw_event_keys_are_read(self):
+        # Older files hold "title-date" keys instead of their hashes
+        with open(bot.get_user_db_path(self.USER_ID), 'w', encoding='utf-8') as f:
+            f.write("Story time-May 3, 2025\n")
+        self.add_event("Story time")
+        self.add_event("Lego club")
+        self.assertEqual(self.new_titles(), ["📌 Lego club"])
+
+    def test_tinydb_histories_are_migrated(self):
+        legacy_path = f"data/{self.USER_ID}.json"
+        with open(legacy_path, 'wb') as f:
+            f.write(orjson.dumps({'_default': {'1': {'fingerprint': "Story time-May 3, 2025"}}}))
+        bot.migrate_user_databases()
+        self.assertFalse(os.path.exists(legacy_path))
+        self.assertIn(self.USER_ID, bot.get_all_user_ids())
+
+        self.add_event("Story time")
+        self.assertEqual(self.new_titles(), [])
+
+if __name__ == "__main__":
+    unittest.main()
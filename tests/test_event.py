@@ -0,0 +1,36 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from support import enter_scratch_directory
+
+event = None
+
+def setUpModule():
+    # The geocoding and weather sessions open their caches under data/ when imported
+    global event
+    enter_scratch_directory()
+    from providers import event as event_module
+    event = event_module
+
+class AreaForecastTest(unittest.TestCase):
+    def setUp(self):
+        event.AREA_FORECASTS.clear()
+        self.start = datetime(2025, 5, 3, 14)
+
+    def test_successful_forecast_is_shared(self):
+        forecast = object()
+        with mock.patch.object(event, 'get_weather_forecast', return_value=forecast) as get_forecast:
+            self.assertIs(event.get_area_forecast(47.61, -122.33, self.start), forecast)
+            self.assertIs(event.get_area_forecast(47.61, -122.33, self.start), forecast)
+        self.assertEqual(get_forecast.call_count, 1)
+
+    def test_failed_forecast_is_retried(self):
+        forecast = object()
+        with mock.patch.object(event, 'get_weather_forecast', side_effect=[None, forecast]) as get_forecast:
+            self.assertIsNone(event.get_area_forecast(47.61, -122.33, self.start))
+            self.assertIs(event.get_area_forecast(47.61, -122.33, self.start), forecast)
+        self.assertEqual(get_forecast.call_count, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import unittest
+from pathlib import Path
+from datetime import datetime
+
+import orjson
+
+from support import enter_scratch_directory
+from helpers import event_store
+
+def setUpModule():
+    enter_scratch_directory()
+
+def event_dict(title, date="May 3, 2025", **fields):
+    return {'title': title, 'date': date, 'link': f"https://example.com/{title}", **fields}
+
+class EventStoreTest(unittest.TestCase):
+    def setUp(self):
+        # Each test gets its own data directory
+        data_dir = Path(self.id()) / 'data'
+        data_dir.mkdir(parents=True)
+        self.path = str(data_dir / 'events.db')
+
+    def connect(self):
+        conn = event_store.connect(self.path)
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_events_round_trip_in_insertion_order(self):
+        conn = self.connect()
+        weather = {'summary': "Overcast", 'datetime': datetime(2025, 5, 3, 14, 0)}
+        with conn:
+            event_store.insert_event(conn, event_dict("Story time", weather=weather, is_estimated_address=True))
+            event_store.insert_event(conn, event_dict("Lego club"))
+        events = event_store.all_events(conn)
+        self.assertEqual([event.title for event in events], ["Story time", "Lego club"])
+        self.assertEqual(events[0].weather, {'summary': "Overcast", 'datetime': "2025-05-03T14:00:00"})
+        self.assertTrue(events[0].is_estimated_address)
+        self.assertEqual(events[1].location, "")
+        self.assertEqual(events[0].fingerprint, event_store.event_fingerprint("Story time", "May 3, 2025"))
+        self.assertEqual(len(event_store.all_events(conn, limit=1)), 1)
+        self.assertEqual(event_store.count_events(conn), 2)
+
+    def test_find_and_set_suggestion(self):
+        conn = self.connect()
+        with conn:
+            event_store.insert_event(conn, event_dict("Story time"))
+            event_store.set_suggestion(conn, "Story time", "May 3, 2025", "Bring a blanket.")
+        self.assertEqual(event_store.find_event(conn, "Story time", "May 3, 2025")['suggestion'], "Bring a blanket.")
+        self.assertIsNone(event_store.find_event(conn, "Story time", "May 4, 2025"))
+
+    def test_clear_events(self):
+        conn = self.connect()
+        with conn:
+            event_store.insert_event(conn, event_dict("Story time"))
+        event_store.clear_events(conn)
+        self.assertEqual(event_store.count_events(conn), 0)
+
+    def test_fingerprints_are_added_to_older_databases(self):
+        # Databases created before fingerprints existed have no fingerprint column
+        old_conn = sqlite3.connect(self.path)
+        old_conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, title TEXT, date TEXT, weather TEXT)")
+        old_conn.execute("INSERT INTO events (title, date) VALUES ('Story time', 'May 3, 2025'), (NULL, NULL)")
+        old_conn.commit()
+        old_conn.close()
+
+        conn = self.connect()
+        fingerprints = [row['fingerprint'] for row in conn.execute("SELECT fingerprint FROM events ORDER BY id")]
+        self.assertEqual(fingerprints, [
+            event_store.event_fingerprint("Story time", "May 3, 2025"),
+            event_store.event_fingerprint("", "")
+        ])
+
+    def test_tinydb_events_are_imported_once(self):
+        legacy_path = self.path[:-len('.db')] + '.json'
+        with open(legacy_path, 'wb') as f:
+            f.write(orjson.dumps({'_default': {
+                '2': event_dict("Lego club", weather={'summary': "Clear sky", 'datetime': "2025-05-03T10:00:00"}),
+                '1': event_dict("Story time", suggestion="TODO"),
+            }}))
+
+        conn = self.connect()
+        events = event_store.all_events(conn)
+        self.assertEqual([event.title for event in events], ["Story time", "Lego club"])
+        self.assertEqual(events[1].weather['summary'], "Clear sky")
+        self.assertEqual(events[0].fingerprint, event_store.event_fingerprint("Story time", "May 3, 2025"))
+        self.assertFalse(os.path.exists(legacy_path))
+
+        # A file left over from an interrupted import does not duplicate events
+        with open(legacy_path, 'wb') as f:
+            f.write(orjson.dumps({'_default': {'1': event_dict("Story time")}}))
+        conn.close()
+        conn = self.connect()
+        self.assertEqual(event_store.count_events(conn), 2)
+
+if __name__ == "__main__":
+    unittest.main()
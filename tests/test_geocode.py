@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+from support import enter_scratch_directory
+
+geocode = None
+
+ADDRESS = "Bellevue Library, 1111 110th Ave NE, Bellevue, WA 98004"
+FOUND = [{'display_name': "Bellevue Library, Bellevue, King County, Washington, 98004, United States", 'lat': "47.61", 'lon': "-122.19"}]
+
+def setUpModule():
+    # The geocoding session opens its cache under data/ when imported
+    global geocode
+    enter_scratch_directory()
+    from geo import geocode as geocode_module
+    geocode = geocode_module
+
+def responses(*bodies):
+    """Return a stand-in for nominatim_get that answers with the given JSON bodies in turn."""
+    return mock.Mock(side_effect=[mock.Mock(json=mock.Mock(return_value=body)) for body in bodies])
+
+class GeocodeAddressTest(unittest.TestCase):
+    def setUp(self):
+        geocode.geocoded_addresses.clear()
+
+    def test_located_address_is_kept_in_memory(self):
+        with mock.patch.object(geocode, 'nominatim_get', responses(FOUND)) as nominatim_get:
+            first = geocode.geocode_address(ADDRESS)
+            second = geocode.geocode_address(ADDRESS)
+        self.assertEqual(first, (FOUND[0]['display_name'], 47.61, -122.19, False))
+        self.assertEqual(second, first)
+        self.assertEqual(nominatim_get.call_count, 1)
+
+    def test_address_not_found_is_looked_up_again(self):
+        # Nothing is found for the address nor for its city, then the address is found
+        with mock.patch.object(geocode, 'nominatim_get', responses([], [], FOUND)) as nominatim_get:
+            self.assertIsNone(geocode.geocode_address(ADDRESS)[1])
+            self.assertEqual(geocode.geocode_address(ADDRESS)[1:3], (47.61, -122.19))
+        self.assertEqual(nominatim_get.call_count, 3)
+
+    def test_invalid_address_is_not_looked_up(self):
+        with mock.patch.object(geocode, 'nominatim_get') as nominatim_get:
+            self.assertEqual(geocode.geocode_address("Online"), ("Online", None, None, False))
+        nominatim_get.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
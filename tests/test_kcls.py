@@ -0,0 +1,49 @@
+import unittest
+from unittest import mock
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from support import enter_scratch_directory
+
+kcls = None
+
+def setUpModule():
+    # The geocoding and weather sessions open their caches under data/ when imported
+    global kcls
+    enter_scratch_directory()
+    from providers import kcls as kcls_module
+    kcls = kcls_module
+
+def fake_playwright(page):
+    """Return a stand-in for async_playwright whose browser opens `page`."""
+    browser = mock.AsyncMock()
+    browser.new_page.return_value = page
+    playwright = mock.MagicMock()
+    playwright.chromium.launch = mock.AsyncMock(return_value=browser)
+    context = mock.MagicMock()
+    context.__aenter__ = mock.AsyncMock(return_value=playwright)
+    context.__aexit__ = mock.AsyncMock(return_value=False)
+    return mock.MagicMock(return_value=context)
+
+class KCLSDownloadTest(unittest.IsolatedAsyncioTestCase):
+    async def test_load_timeout_fails_the_provider(self):
+        page = mock.AsyncMock()
+        page.wait_for_load_state.side_effect = PlaywrightTimeoutError("Timeout 30000ms exceeded.")
+        provider = kcls.KCLSEventProvider()
+        with mock.patch.object(kcls, 'async_playwright', fake_playwright(page)):
+            with self.assertRaises(PlaywrightTimeoutError):
+                await provider.download_events()
+        page.eval_on_selector_all.assert_not_awaited()
+        self.assertEqual(provider.events, [])
+
+    async def test_empty_event_list_is_not_an_error(self):
+        page = mock.AsyncMock()
+        page.eval_on_selector_all.return_value = []
+        provider = kcls.KCLSEventProvider()
+        with mock.patch.object(kcls, 'async_playwright', fake_playwright(page)):
+            await provider.download_events()
+        page.wait_for_load_state.assert_awaited_once_with('networkidle', timeout=kcls.EVENTS_LOAD_TIMEOUT)
+        self.assertEqual(provider.events, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from telegram import MessageEntity
+
+import support  # noqa: F401  Puts the repository root on sys.path
+from helpers.message import FormattedText, utf16_len
+
+class FormattedTextTest(unittest.TestCase):
+    def test_lengths_are_counted_in_utf16_code_units(self):
+        self.assertEqual(utf16_len("abc"), 3)
+        # Emoji outside the Basic Multilingual Plane take two code units, accented letters one
+        self.assertEqual(utf16_len("📌"), 2)
+        self.assertEqual(utf16_len("🌤️"), 3)
+        self.assertEqual(utf16_len("café"), 4)
+
+    def test_entity_offsets_follow_preceding_emoji(self):
+        message = FormattedText().add("📌 ").add("Date:", MessageEntity.BOLD).add(" May 3")
+        self.assertEqual(message.text, "📌 Date: May 3")
+        self.assertEqual(len(message), 14)
+        [entity] = message.entities
+        self.assertEqual((entity.type, entity.offset, entity.length), (MessageEntity.BOLD, 3, 5))
+
+    def test_empty_text_gets_no_entity(self):
+        self.assertEqual(FormattedText().add("", MessageEntity.ITALIC).entities, [])
+
+    def test_extend_shifts_entities(self):
+        other = FormattedText().add("🕒 ").add("Time:", MessageEntity.BOLD)
+        link = FormattedText().add("Story time", MessageEntity.TEXT_LINK, url="https://example.com")
+        message = FormattedText().add("📅 ").extend(link).add("\n").extend(other)
+        self.assertEqual(message.text, "📅 Story time\n🕒 Time:")
+        self.assertEqual(
+            [(entity.type, entity.offset, entity.length, entity.url) for entity in message.entities],
+            [(MessageEntity.TEXT_LINK, 3, 10, "https://example.com"), (MessageEntity.BOLD, 17, 5, None)]
+        )
+        self.assertEqual(len(message), utf16_len(message.text))
+
+    def test_dict_round_trip(self):
+        message = FormattedText().add("📍 ").add("Library", MessageEntity.TEXT_LINK, url="https://maps.google.com/")
+        copy = FormattedText.from_dict(message.to_dict())
+        self.assertEqual(copy.text, message.text)
+        self.assertEqual(copy.entities, message.entities)
+        self.assertEqual(len(copy), len(message))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import unittest
+from contextlib import closing
+from types import SimpleNamespace
+from unittest import mock
+
+import orjson
+
+from support import enter_scratch_directory
+
+planner = None
+logger = logging.getLogger(__name__)
+
+def setUpModule():
+    # Suggestions and events are stored under data/
+    global planner
+    enter_scratch_directory()
+    import planner as planner_module
+    planner = planner_module
+
+def make_event(title, format="Onsite", weather=None):
+    return SimpleNamespace(
+        title=title, location="Library", full_address="1111 110th Ave NE, Bellevue, WA", date="May 3, 2025",
+        time="10:30 AM", weather=weather, format=format, description="Stories and songs for kids.",
+        to_db_dict=lambda: {'title': title, 'date': "May 3, 2025"}
+    )
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def batch_reply(suggestions):
+    """Return a batch reply suggesting suggestions[number] for each event number."""
+    return completion(orjson.dumps([{'id': number, 'suggestion': text} for number, text in suggestions.items()]).decode())
+
+def is_batch_prompt(kwargs):
+    return "JSON array" in kwargs['messages'][0]['content']
+
+class SuggestionTest(unittest.TestCase):
+    def setUp(self):
+        with closing(planner.suggestion_cache.connect()) as cache, cache:
+            cache.execute("DELETE FROM suggestions")
+        self.events = [make_event("Story time"), make_event("Lego club"), make_event("Music and movement")]
+
+    def generate(self, reply):
+        """Generate suggestions for self.events with the model answering through `reply`."""
+        acompletion = mock.AsyncMock(side_effect=reply)
+        with mock.patch.object(planner.litellm, 'acompletion', acompletion):
+            suggestions = asyncio.run(planner.generate_event_suggestions(self.events, logger))
+        return suggestions, acompletion
+
+    def test_batch_reply_answers_every_event(self):
+        suggestions, acompletion = self.generate(lambda **kwargs: batch_reply({1: "A", 2: "B", 3: "C"}))
+        self.assertEqual(suggestions, ["A", "B", "C"])
+        self.assertEqual(acompletion.await_count, 1)
+
+    def test_cached_suggestions_are_reused(self):
+        self.generate(lambda **kwargs: batch_reply({1: "A", 2: "B", 3: "C"}))
+        suggestions, acompletion = self.generate(lambda **kwargs: self.fail("The model should not be called"))
+        self.assertEqual(suggestions, ["A", "B", "C"])
+        acompletion.assert_not_awaited()
+
+    def test_malformed_batch_reply_falls_back_to_single_prompts(self):
+        def reply(**kwargs):
+            return completion("Sure! Here are your suggestions:") if is_batch_prompt(kwargs) else completion(" Single ")
+        suggestions, acompletion = self.generate(reply)
+        self.assertEqual(suggestions, ["Single"] * 3)
+        self.assertEqual(acompletion.await_count, 4)
+
+    def test_events_missing_from_the_batch_reply_are_asked_for_alone(self):
+        def reply(**kwargs):
+            return batch_reply({1: "A", 3: "C", 7: "Unknown"}) if is_batch_prompt(kwargs) else completion("Single")
+        suggestions, acompletion = self.generate(reply)
+        self.assertEqual(suggestions, ["A", "Single", "C"])
+        self.assertEqual(acompletion.await_count, 2)
+
+    def test_failed_requests_are_not_cached(self):
+        suggestions, _ = self.generate(mock.Mock(side_effect=RuntimeError("rate limited")))
+        self.assertEqual(suggestions, ["No suggestion available due to an error."] * 3)
+        suggestions, _ = self.generate(lambda **kwargs: batch_reply({1: "A", 2: "B", 3: "C"}))
+        self.assertEqual(suggestions, ["A", "B", "C"])
+
+    def test_online_events_without_weather_need_no_request(self):
+        self.events = [make_event("Virtual story time", format="Online")]
+        suggestions, acompletion = self.generate(lambda **kwargs: self.fail("The model should not be called"))
+        self.assertEqual(suggestions, [planner.ONLINE_SUGGESTION])
+        acompletion.assert_not_awaited()
+
+    def test_events_are_split_into_batches(self):
+        self.events = [make_event(f"Event {number}") for number in range(planner.SUGGESTION_BATCH_SIZE + 1)]
+        def reply(**kwargs):
+            count = kwargs['messages'][0]['content'].count("Event Title:")
+            return batch_reply({number: f"S{number}" for number in range(1, count + 1)})
+        suggestions, acompletion = self.generate(reply)
+        self.assertEqual(acompletion.await_count, 2)
+        self.assertEqual(suggestions[-1], "S1")
+
+class StoreEventsTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = planner.event_store.connect()
+        self.addCleanup(self.conn.close)
+        planner.event_store.clear_events(self.conn)
+
+    def stored_suggestions(self):
+        return [row['suggestion'] for row in self.conn.execute("SELECT suggestion FROM events ORDER BY id")]
+
+    def test_suggestions_are_not_generated_unless_enabled(self):
+        with mock.patch.object(planner, 'GENERATE_SUGGESTIONS', False), \
+                mock.patch.object(planner, 'generate_event_suggestions') as generate:
+            self.assertEqual(planner.store_events_in_db(self.conn, "KCLS", [make_event("Story time")], logger), (1, 0))
+        generate.assert_not_called()
+        self.assertEqual(self.stored_suggestions(), [planner.SUGGESTION_PLACEHOLDER])
+
+    def test_enabled_suggestions_fill_in_placeholders(self):
+        with mock.patch.object(planner, 'GENERATE_SUGGESTIONS', False):
+            planner.store_events_in_db(self.conn, "KCLS", [make_event("Story time")], logger)
+        events = [make_event("Story time"), make_event("Lego club"), make_event("Lego club")]
+        generate = mock.AsyncMock(return_value=["Bring a blanket.", "Build a tower."])
+        with mock.patch.object(planner, 'GENERATE_SUGGESTIONS', True), \
+                mock.patch.object(planner, 'generate_event_suggestions', generate):
+            self.assertEqual(planner.store_events_in_db(self.conn, "KCLS", events, logger), (1, 2))
+        self.assertEqual(self.stored_suggestions(), ["Bring a blanket.", "Build a tower."])
+
+if __name__ == "__main__":
+    unittest.main()
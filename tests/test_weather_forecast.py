@@ -0,0 +1,124 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import orjson
+import requests
+
+from support import enter_scratch_directory
+
+weather_forecast = None
+
+def setUpModule():
+    # The weather session opens its cache under data/ when imported
+    global weather_forecast
+    enter_scratch_directory()
+    from weather import weather_forecast as weather_forecast_module
+    weather_forecast = weather_forecast_module
+
+def forecast_response(times):
+    """Return an open-meteo response whose hourly temperatures number the given local times."""
+    count = len(times)
+    data = {
+        'daily': {
+            'time': [times[0][:10]], 'weathercode': [3], 'temperature_2m_max': [20.0], 'temperature_2m_min': [10.0],
+            'precipitation_sum': [0.0], 'precipitation_probability_max': [30], 'windspeed_10m_max': [12.0]
+        },
+        'hourly': {
+            'time': times, 'temperature_2m': list(range(count)), 'weathercode': [61] * count,
+            'precipitation_probability': [5] * count, 'precipitation': [0.0] * count, 'windspeed_10m': [3.0] * count
+        }
+    }
+    return mock.Mock(content=orjson.dumps(data), raise_for_status=mock.Mock())
+
+def day_times(date, hours):
+    return [f"{date}T{hour:02d}:00" for hour in hours]
+
+class HourlyWindowTest(unittest.TestCase):
+    def forecast(self, times, start, end):
+        with mock.patch.object(weather_forecast, 'fetch_forecast', return_value=forecast_response(times)):
+            return weather_forecast.get_weather_forecast((47.61, -122.33), start, end)
+
+    def test_window_on_an_ordinary_day(self):
+        forecast = self.forecast(day_times("2025-05-03", range(24)), datetime(2025, 5, 3, 14), datetime(2025, 5, 3, 16))
+        self.assertEqual([hour.time for hour in forecast.hourly], day_times("2025-05-03", [14, 15, 16]))
+        self.assertEqual(forecast.hourly[0].temperature, 14)
+        self.assertEqual(forecast.daily.precipitation_probability_text, "30% chance of rain")
+
+    def test_window_when_daylight_saving_time_starts(self):
+        # 2 AM is skipped, so the day has 23 entries
+        times = day_times("2025-03-09", [hour for hour in range(24) if hour != 2])
+        forecast = self.forecast(times, datetime(2025, 3, 9, 14), datetime(2025, 3, 9, 16))
+        self.assertEqual([hour.time for hour in forecast.hourly], day_times("2025-03-09", [14, 15, 16]))
+
+    def test_window_when_daylight_saving_time_ends(self):
+        # 1 AM is repeated, so the day has 25 entries
+        times = day_times("2025-11-02", [0, 1, 1] + list(range(2, 24)))
+        forecast = self.forecast(times, datetime(2025, 11, 2, 14), datetime(2025, 11, 2, 16))
+        self.assertEqual([hour.time for hour in forecast.hourly], day_times("2025-11-02", [14, 15, 16]))
+
+    def test_window_spanning_midnight_ends_with_the_start_day(self):
+        forecast = self.forecast(day_times("2025-05-03", range(24)), datetime(2025, 5, 3, 22), datetime(2025, 5, 4, 0))
+        self.assertEqual([hour.time for hour in forecast.hourly], day_times("2025-05-03", [22, 23]))
+
+def error_response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = "https://api.open-meteo.com/v1/forecast"
+    return response
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        weather_forecast.weather_failures = 0
+        weather_forecast.weather_retry_at = 0.0
+        self.session = mock.Mock()
+        patch = mock.patch.object(weather_forecast, 'session', self.session)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def only_if_cached_flags(self):
+        return [call.kwargs['only_if_cached'] for call in self.session.get.call_args_list]
+
+    def fail_requests(self, count):
+        for _ in range(count):
+            with self.assertRaises(requests.exceptions.RequestException):
+                weather_forecast.fetch_forecast({})
+
+    def test_repeated_failures_serve_only_cached_forecasts(self):
+        def get(*args, only_if_cached, **kwargs):
+            # A forecast that is not cached is answered with 504 by requests_cache
+            if only_if_cached:
+                return error_response(504)
+            raise requests.exceptions.ConnectionError("down")
+        self.session.get.side_effect = get
+        self.fail_requests(weather_forecast.WEATHER_BREAKER_FAILURES + 1)
+        self.assertEqual(self.only_if_cached_flags(), [False] * weather_forecast.WEATHER_BREAKER_FAILURES + [True])
+
+    def test_breaker_closes_after_the_reset_time(self):
+        self.session.get.side_effect = requests.exceptions.Timeout("slow")
+        self.fail_requests(weather_forecast.WEATHER_BREAKER_FAILURES)
+        self.session.get.side_effect = None
+        self.session.get.return_value = mock.Mock(raise_for_status=mock.Mock())
+        with mock.patch.object(weather_forecast.time, 'monotonic', return_value=weather_forecast.weather_retry_at + 1):
+            weather_forecast.fetch_forecast({})
+        self.assertFalse(self.only_if_cached_flags()[-1])
+
+    def test_success_resets_the_failure_count(self):
+        self.session.get.side_effect = requests.exceptions.ConnectionError("down")
+        self.fail_requests(weather_forecast.WEATHER_BREAKER_FAILURES - 1)
+        self.session.get.side_effect = None
+        self.session.get.return_value = mock.Mock(raise_for_status=mock.Mock())
+        weather_forecast.fetch_forecast({})
+        self.assertEqual(weather_forecast.weather_failures, 0)
+
+    def test_rejected_requests_do_not_open_the_breaker(self):
+        self.session.get.return_value = error_response(400)
+        self.fail_requests(weather_forecast.WEATHER_BREAKER_FAILURES + 1)
+        self.assertNotIn(True, self.only_if_cached_flags())
+
+    def test_failure_returns_no_forecast(self):
+        self.session.get.side_effect = requests.exceptions.ConnectionError("down")
+        self.assertIsNone(weather_forecast.get_weather_forecast((47.61, -122.33), datetime(2025, 5, 3, 14)))
+
+if __name__ == "__main__":
+    unittest.main()
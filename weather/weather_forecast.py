@@ -1,113 +1,179 @@
+import bisect
 import logging
+import re
+import threading
+import time
+import orjson
 import requests
-from datetime import datetime, timedelta
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Forecasts are requested per day, so events at the same place share a response for an hour
+WEATHER_CACHE_PATH = 'data/weather_cache'
+WEATHER_CACHE_TTL = 60 * 60  # 1 hour in seconds
+WEATHER_TIMEOUT = 5  # seconds
+COORDINATE_DECIMALS = 4  # ~11 m, far finer than the forecast grid
+WEATHER_POOL_SIZE = 16  # Kept-alive connections, enough for the threads enriching events
+
+# An expired forecast is still better than none when open-meteo is unreachable
+session = requests_cache.CachedSession(WEATHER_CACHE_PATH, expire_after=WEATHER_CACHE_TTL, stale_if_error=True)
+# Transient server errors and rate limiting are retried briefly before giving up
+session.mount("https://", HTTPAdapter(
+    pool_maxsize=WEATHER_POOL_SIZE,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(429, 500, 502, 503, 504))
+))
+
+# After repeated failures open-meteo is given a rest, and only cached forecasts are served
+WEATHER_BREAKER_FAILURES = 5  # Consecutive failed requests
+WEATHER_BREAKER_RESET = 60  # seconds
+weather_breaker_lock = threading.Lock()
+weather_failures = 0
+weather_retry_at = 0.0
+
+def fetch_forecast(params):
+    """Request a forecast from open-meteo, answering only from the cache while it keeps failing."""
+    global weather_failures, weather_retry_at
+    with weather_breaker_lock:
+        only_if_cached = time.monotonic() < weather_retry_at
+    try:
+        response = session.get("https://api.open-meteo.com/v1/forecast", params=params, timeout=WEATHER_TIMEOUT, only_if_cached=only_if_cached)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        # Rejected requests say nothing about whether the service is up
+        rejected = isinstance(e, requests.exceptions.HTTPError) and e.response is not None and e.response.status_code < 500
+        if not only_if_cached and not rejected:
+            with weather_breaker_lock:
+                weather_failures += 1
+                if weather_failures >= WEATHER_BREAKER_FAILURES:
+                    weather_failures = 0
+                    weather_retry_at = time.monotonic() + WEATHER_BREAKER_RESET
+                    logger.warning(f"Weather API failed {WEATHER_BREAKER_FAILURES} times in a row, serving only cached forecasts for {WEATHER_BREAKER_RESET} s")
+        raise
+    if not only_if_cached:
+        with weather_breaker_lock:
+            weather_failures = 0
+    return response
+
+# Dates with an optional time, as accepted by get_weather_forecast
+DATETIME_RE = re.compile(r"(\d{4}-\d{2}-\d{2})(?: (\d{2}):\d{2}:\d{2})?")
+
+# WMO weather interpretation codes used by open-meteo
+WEATHER_CODES = {
+    0: "Clear sky",
+    1: "Mainly clear",
+    2: "Partly cloudy",
+    3: "Overcast",
+    45: "Fog",
+    48: "Depositing rime fog",
+    51: "Light drizzle",
+    53: "Moderate drizzle",
+    55: "Dense drizzle",
+    56: "Light freezing drizzle",
+    57: "Dense freezing drizzle",
+    61: "Slight rain",
+    63: "Moderate rain",
+    65: "Heavy rain",
+    66: "Light freezing rain",
+    67: "Heavy freezing rain",
+    71: "Slight snow fall",
+    73: "Moderate snow fall",
+    75: "Heavy snow fall",
+    77: "Snow grains",
+    80: "Slight rain showers",
+    81: "Moderate rain showers",
+    82: "Violent rain showers",
+    85: "Slight snow showers",
+    86: "Heavy snow showers",
+    95: "Thunderstorm",
+    96: "Thunderstorm with slight hail",
+    99: "Thunderstorm with heavy hail"
+}
+
+@dataclass(slots=True, frozen=True)
+class DailyForecast:
+    """Weather summary for the day of a forecast."""
+    date: str
+    summary: str
+    temp_max: float
+    temp_min: float
+    precipitation_mm: float
+    precipitation_probability_text: str
+    max_wind_speed: float
+
+@dataclass(slots=True, frozen=True)
+class HourlyForecast:
+    """Weather for one hour of a forecast."""
+    time: str
+    temperature: float
+    weather: str
+    precipitation_prob: Optional[int]
+    precipitation_mm: float
+    wind_speed: float
+
+@dataclass(slots=True, frozen=True)
+class Forecast:
+    """Daily summary and hourly weather for the requested time window."""
+    daily: DailyForecast
+    hourly: Tuple[HourlyForecast, ...]
+
 def get_weather_description(weather_code):
-    weather_codes = {
-        0: "Clear sky",
-        1: "Mainly clear",
-        2: "Partly cloudy",
-        3: "Overcast",
-        45: "Fog",
-        48: "Depositing rime fog",
-        51: "Light drizzle",
-        53: "Moderate drizzle",
-        55: "Dense drizzle",
-        56: "Light freezing drizzle",
-        57: "Dense freezing drizzle",
-        61: "Slight rain",
-        63: "Moderate rain",
-        65: "Heavy rain",
-        66: "Light freezing rain",
-        67: "Heavy freezing rain",
-        71: "Slight snow fall",
-        73: "Moderate snow fall",
-        75: "Heavy snow fall",
-        77: "Snow grains",
-        80: "Slight rain showers",
-        81: "Moderate rain showers",
-        82: "Violent rain showers",
-        85: "Slight snow showers",
-        86: "Heavy snow showers",
-        95: "Thunderstorm",
-        96: "Thunderstorm with slight hail",
-        99: "Thunderstorm with heavy hail"
-    }
-    
-    return weather_codes.get(weather_code, "Unknown weather code")
+    return WEATHER_CODES.get(weather_code, "Unknown weather code")
+
 
+def parse_datetime(value, default_hour):
+    """Return the date string and hour of a datetime or a "YYYY-MM-DD[ HH:MM:SS]" string, or None."""
+    if isinstance(value, datetime):
+        return value.date().isoformat(), value.hour
+    match = DATETIME_RE.fullmatch(value) if isinstance(value, str) else None
+    if match is None:
+        return None
+    date_str, hour = match.groups()
+    return date_str, int(hour) if hour else default_hour
 
 def get_weather_forecast(lat_lon_tuple, datetime_start=None, datetime_end=None):
     lat, lon = lat_lon_tuple
     if lat is None or lon is None:
         logger.warning("Cannot fetch weather without coordinates.")
         return None
+    # Coordinates are sent and cached in one canonical form
+    try:
+        lat, lon = round(float(lat), COORDINATE_DECIMALS), round(float(lon), COORDINATE_DECIMALS)
+    except (TypeError, ValueError):
+        logger.warning(f"Cannot fetch weather for invalid coordinates {lat_lon_tuple}.")
+        return None
 
     # Handle date/datetime for start
     if datetime_start is None:
         datetime_start = datetime.utcnow()
     
     # For API parameters, we need date strings
-    if isinstance(datetime_start, datetime):
-        start_date = datetime_start.strftime('%Y-%m-%d')
-        start_hour = datetime_start.hour
-    else:
-        # Try to parse string date
-        try:
-            parsed_date = datetime.strptime(datetime_start, '%Y-%m-%d')
-            start_date = datetime_start
-            start_hour = 0  # Default to beginning of day
-        except (ValueError, TypeError):
-            # Try to parse datetime string
-            try:
-                parsed_date = datetime.strptime(datetime_start, '%Y-%m-%d %H:%M:%S')
-                start_date = parsed_date.strftime('%Y-%m-%d')
-                start_hour = parsed_date.hour
-            except (ValueError, TypeError):
-                # Fallback if parsing fails
-                logger.warning("Could not parse datetime_start, using current time")
-                now = datetime.utcnow()
-                start_date = now.strftime('%Y-%m-%d')
-                start_hour = now.hour
+    parsed_start = parse_datetime(datetime_start, default_hour=0)  # Default to beginning of day
+    if parsed_start is None:
+        logger.warning("Could not parse datetime_start, using current time")
+        parsed_start = parse_datetime(datetime.utcnow(), default_hour=0)
+    start_date, start_hour = parsed_start
     
     # Handle date/datetime for end
-    if datetime_end is None:
-        # Default to start date + 1 day if not provided
-        if isinstance(datetime_start, datetime):
-            end_date = (datetime_start + timedelta(days=1)).strftime('%Y-%m-%d')
-            end_hour = start_hour  # Same hour next day
-        else:
-            # Use the parsed start date
-            try:
-                end_date = (datetime.strptime(start_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
-                end_hour = start_hour
-            except (ValueError, TypeError):
-                # Fallback if parsing fails
-                logger.warning("Using default end date")
-                now = datetime.utcnow()
-                end_date = (now + timedelta(days=1)).strftime('%Y-%m-%d')
-                end_hour = now.hour
+    parsed_end = None
+    if datetime_end is not None:
+        parsed_end = parse_datetime(datetime_end, default_hour=23)  # Default to end of day
+        if parsed_end is None:
+            logger.warning("Could not parse datetime_end, using start date + 1 day")
+    if parsed_end is None:
+        # Default to start date + 1 day, same hour
+        end_date = (date.fromisoformat(start_date) + timedelta(days=1)).isoformat()
+        end_hour = start_hour
     else:
-        if isinstance(datetime_end, datetime):
-            end_date = datetime_end.strftime('%Y-%m-%d')
-            end_hour = datetime_end.hour
-        else:
-            try:
-                parsed_date = datetime.strptime(datetime_end, '%Y-%m-%d')
-                end_date = datetime_end
-                end_hour = 23  # Default to end of day
-            except (ValueError, TypeError):
-                try:
-                    parsed_date = datetime.strptime(datetime_end, '%Y-%m-%d %H:%M:%S')
-                    end_date = parsed_date.strftime('%Y-%m-%d')
-                    end_hour = parsed_date.hour
-                except (ValueError, TypeError):
-                    logger.warning("Could not parse datetime_end, using start date + 1 day")
-                    end_date = (datetime.strptime(start_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
-                    end_hour = start_hour
+        end_date, end_hour = parsed_end
 
+    # Only the start day is returned (its daily summary and its hours up to end_hour, or to
+    # midnight when the window spans days), so later days are not downloaded
     params = {
         "latitude": lat,
         "longitude": lon,
@@ -115,57 +181,54 @@ def get_weather_forecast(lat_lon_tuple, datetime_start=None, datetime_end=None):
         "daily": "weathercode,temperature_2m_max,temperature_2m_min,precipitation_sum,precipitation_probability_max,windspeed_10m_max",
         "timezone": "America/Los_Angeles",
         "start_date": start_date,
-        "end_date": end_date
+        "end_date": start_date
     }
 
     try:
-        response = requests.get("https://api.open-meteo.com/v1/forecast", params=params)
-        response.raise_for_status()
-        data = response.json()
+        response = fetch_forecast(params)
+        data = orjson.loads(response.content)
 
         # Return both daily summary and hourly data for the specified time window
         if "daily" in data and "hourly" in data:
             # Daily summary 
-            daily_forecast = {
-                "date": data["daily"]["time"][0],
-                "summary": get_weather_description(data["daily"]["weathercode"][0]),
-                "temp_max": data["daily"]["temperature_2m_max"][0],
-                "temp_min": data["daily"]["temperature_2m_min"][0],
-                "precipitation_mm": data["daily"]["precipitation_sum"][0],
-                "precipitation_probability_text": f"{data['daily']['precipitation_probability_max'][0]}% chance of rain",
-                "max_wind_speed": data["daily"]["windspeed_10m_max"][0]  # Add max wind speed to daily data
-            }
-            
-            # Extract hourly data for the requested time window
-            hourly_data = []
+            daily_forecast = DailyForecast(
+                date=data["daily"]["time"][0],
+                summary=get_weather_description(data["daily"]["weathercode"][0]),
+                temp_max=data["daily"]["temperature_2m_max"][0],
+                temp_min=data["daily"]["temperature_2m_min"][0],
+                precipitation_mm=data["daily"]["precipitation_sum"][0],
+                precipitation_probability_text=f"{data['daily']['precipitation_probability_max'][0]}% chance of rain",
+                max_wind_speed=data["daily"]["windspeed_10m_max"][0]
+            )
             
             # Calculate time indices
-            start_time_str = f"{start_date}T{start_hour:02d}:00"
             if start_date == end_date:
                 end_hour_adjusted = min(end_hour + 1, 24)
             else:
                 end_hour_adjusted = 24  # If different days, go to end of start day
                 
-            # Filter hourly data to match our time window
-            for i, time_str in enumerate(data["hourly"]["time"]):
-                hour_datetime = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
-                if start_date in time_str and hour_datetime.hour >= start_hour and hour_datetime.hour < end_hour_adjusted:
-                    hourly_data.append({
-                        "time": time_str,
-                        "temperature": data["hourly"]["temperature_2m"][i],
-                        "weather": get_weather_description(data["hourly"]["weathercode"][i]),
-                        "precipitation_prob": data["hourly"]["precipitation_probability"][i],
-                        "precipitation_mm": data["hourly"]["precipitation"][i],
-                        "wind_speed": data["hourly"]["windspeed_10m"][i]  # Add wind speed to hourly data
-                    })
+            # Hourly times are sorted local times, so the requested time window is the slice between
+            # its first and last hour. They are searched rather than indexed by hour, since days
+            # when daylight saving time starts or ends have 23 or 25 entries.
+            hourly = data["hourly"]
+            window = slice(
+                bisect.bisect_left(hourly["time"], f"{start_date}T{start_hour:02d}:00"),
+                bisect.bisect_left(hourly["time"], f"{start_date}T{end_hour_adjusted:02d}:00")
+            )
+            hourly_data = tuple(
+                HourlyForecast(time_str, temperature, get_weather_description(weather_code), precipitation_prob, precipitation_mm, wind_speed)
+                for time_str, temperature, weather_code, precipitation_prob, precipitation_mm, wind_speed in zip(
+                    hourly["time"][window],
+                    hourly["temperature_2m"][window],
+                    hourly["weathercode"][window],
+                    hourly["precipitation_probability"][window],
+                    hourly["precipitation"][window],
+                    hourly["windspeed_10m"][window]
+                )
+            )
             
             # Return combined forecast
-            forecast = {
-                "daily": daily_forecast,
-                "hourly": hourly_data
-            }
-            
-            return forecast
+            return Forecast(daily=daily_forecast, hourly=hourly_data)
         else:
             logger.error("Unexpected response structure from weather API.")
             return None
@@ -173,3 +236,6 @@ def get_weather_forecast(lat_lon_tuple, datetime_start=None, datetime_end=None):
     except requests.exceptions.RequestException as e:
         logger.error(f"Weather API request failed: {e}")
         return None
+    except orjson.JSONDecodeError as e:
+        logger.error(f"Weather API returned invalid JSON: {e}")
+        return None